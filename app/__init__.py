@@ -1,12 +1,14 @@
-from flask import Flask
 # Importamos db y SYSTEM_ROOT para saber donde guardar los logs
-from app.database import db, SYSTEM_ROOT
-import logging
-from logging.handlers import RotatingFileHandler
+from app.database import db, SYSTEM_ROOT, CAMPUS_DEFECTO, existe_campus
 import os
-from app.models import Profesor, Materia, Curso, Horario, ProfesorMateria
+from app.models import activar_campus
+from app.registro import configurar_registro
 
 def create_app():
+    # Flask se importa aquí: el motor (app.engine) y la CLI generar.py no dependen de él
+    from flask import Flask, request, g, jsonify
+    from flask.logging import default_handler
+
     app = Flask(__name__)
     app.config['SECRET_KEY'] = 'tu_clave_secreta_aqui'
 
@@ -22,35 +24,49 @@ def create_app():
             if not os.path.exists(LOG_FOLDER):
                 os.mkdir(LOG_FOLDER)
 
-    log_file_path = os.path.join(LOG_FOLDER, 'sistema_horarios.log')
-
-    file_handler = RotatingFileHandler(log_file_path, maxBytes=1024 * 1024, backupCount=5)
-    file_handler.setFormatter(logging.Formatter(
-        '%(asctime)s %(levelname)s: %(message)s [in %(pathname)s:%(lineno)d]'
-    ))
-    file_handler.setLevel(logging.INFO)
-    app.logger.addHandler(file_handler)
+    # Registro no bloqueante: los handlers escriben JSON lines desde un hilo QueueListener
+    # (incluye los logs del motor, app.engine.*, y los logs de búsqueda de CP-SAT por ejecución)
+    app.logger.removeHandler(default_handler)
+    configurar_registro(app.logger, LOG_FOLDER)
 
-    app.logger.setLevel(logging.INFO)
     app.logger.info(f'Iniciando Sistema de Horarios. Raíz de datos: {SYSTEM_ROOT}')
     
-    # ---INICIALIZACIÓN DE TABLAS ---
+    # ---INICIALIZACIÓN DE TABLAS (Campus por defecto) ---
     try:
-        if db.is_closed():
-            db.connect()
-        db.create_tables([Profesor, Materia, Curso, Horario, ProfesorMateria], safe=True)
+        activar_campus(CAMPUS_DEFECTO)
         app.logger.info("Base de datos inicializada: Tablas verificadas.")
     except Exception as e:
         app.logger.critical(f"Error crítico creando tablas: {str(e)}")
-    finally:
-        if not db.is_closed():
-            db.close()
 
     @app.before_request
     def before_request():
+        # Campus de la petición: cabecera > parámetro > cookie > defecto
+        campus = (request.headers.get('X-Campus')
+                  or request.args.get('campus')
+                  or request.cookies.get('campus')
+                  or CAMPUS_DEFECTO)
+        # Solo se vinculan campus existentes: los campus se crean únicamente con POST /api/campus
+        try:
+            existe = existe_campus(campus)
+        except ValueError:
+            existe = False
+        if not existe:
+            if request.path.startswith('/api/') and request.path != '/api/campus':
+                return jsonify({'error': f"El campus '{campus}' no existe."}), 404
+            # Páginas (y el selector de campus) con una cookie obsoleta: se usa el campus por defecto
+            # y se borra la cookie, salvo que la respuesta elija otro campus
+            g.campus_invalido = True
+            campus = CAMPUS_DEFECTO
+        g.campus = activar_campus(campus)
         if db.is_closed():
             db.connect()
 
+    @app.after_request
+    def after_request(resp):
+        if g.get('campus_invalido') and not any(c.startswith('campus=') for c in resp.headers.getlist('Set-Cookie')):
+            resp.delete_cookie('campus')
+        return resp
+
     @app.teardown_request
     def teardown_request(exc):
         if not db.is_closed():
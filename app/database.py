@@ -1,6 +1,9 @@
-from peewee import SqliteDatabase
+from peewee import SqliteDatabase, DatabaseProxy
+from contextlib import contextmanager
 import os
+import re
 import sys
+import threading
 import ctypes.wintypes
 
 # --- Lógica para obtener rutas del sistema (Documentos) ---
@@ -49,5 +52,130 @@ if not os.path.exists(DB_FOLDER):
 
 db_path = os.path.join(DB_FOLDER, DB_FILE)
 
-# Inicializamos la base de datos
-db = SqliteDatabase(db_path, pragmas={'foreign_keys': 1, 'journal_mode': 'wal'})
\ No newline at end of file
+# --- Multi-Campus (Tenancy) ---
+# Cada campus tiene su propio archivo SQLite. El campus por defecto conserva
+# 'horarios.db' para no romper instalaciones existentes.
+CAMPUS_DEFECTO = 'principal'
+PREFIJO_DB_CAMPUS = 'horarios_'
+_patron_campus = re.compile(r'^[a-z0-9_-]{1,40}$')
+
+SQLITE_PRAGMAS = {'foreign_keys': 1, 'journal_mode': 'wal'}
+
+
+class TenantDatabaseProxy(DatabaseProxy):
+    """
+    DatabaseProxy cuyo destino es local a cada hilo.
+    Permite que dos peticiones (o dos generaciones) de campus distintos
+    trabajen en paralelo sin pisarse la base de datos activa.
+    """
+    __slots__ = ('_callbacks', '_Model', '_local')
+
+    def __init__(self):
+        object.__setattr__(self, '_local', threading.local())
+        super().__init__()
+
+    @property
+    def obj(self):
+        # Hilos sin campus explícito (scripts, arranque) usan el campus por defecto
+        obj = getattr(self._local, 'obj', None)
+        return obj if obj is not None else obtener_db_campus(CAMPUS_DEFECTO)
+
+    def initialize(self, obj):
+        self._local.obj = obj
+        for callback in self._callbacks:
+            callback(obj)
+
+
+_bases_campus = {}
+_lock_campus = threading.Lock()
+
+
+def normalizar_campus(nombre):
+    """Valida el identificador de campus (se usa como parte del nombre de archivo)."""
+    nombre = (nombre or CAMPUS_DEFECTO).strip().lower()
+    if not _patron_campus.match(nombre):
+        raise ValueError(f"Identificador de campus inválido: '{nombre}'. Use letras, números, '-' o '_'.")
+    return nombre
+
+
+def ruta_db_campus(nombre):
+    nombre = normalizar_campus(nombre)
+    if nombre == CAMPUS_DEFECTO:
+        return db_path
+    return os.path.join(DB_FOLDER, f'{PREFIJO_DB_CAMPUS}{nombre}.db')
+
+
+def obtener_db_campus(nombre):
+    """Devuelve (y cachea) la instancia SqliteDatabase del campus."""
+    nombre = normalizar_campus(nombre)
+    with _lock_campus:
+        if nombre not in _bases_campus:
+            _bases_campus[nombre] = SqliteDatabase(ruta_db_campus(nombre), pragmas=SQLITE_PRAGMAS)
+        return _bases_campus[nombre]
+
+
+def existe_campus(nombre):
+    """True si el campus ya tiene base (en disco o registrada); no crea nada."""
+    nombre = normalizar_campus(nombre)
+    if nombre == CAMPUS_DEFECTO:
+        return True
+    with _lock_campus:
+        if nombre in _bases_campus:
+            return True
+    return os.path.exists(ruta_db_campus(nombre))
+
+
+def listar_campus():
+    """Campus existentes en disco (más el campus por defecto)."""
+    campus = {CAMPUS_DEFECTO}
+    try:
+        for archivo in os.listdir(DB_FOLDER):
+            if archivo.startswith(PREFIJO_DB_CAMPUS) and archivo.endswith('.db'):
+                campus.add(archivo[len(PREFIJO_DB_CAMPUS):-3])
+    except OSError:
+        pass
+    return sorted(campus)
+
+
+def registrar_archivo_campus(ruta):
+    """
+    Registra un archivo SQLite arbitrario como campus (herramientas de línea de comandos)
+    y devuelve su identificador, derivado del nombre del archivo.
+    """
+    base = os.path.splitext(os.path.basename(ruta))[0].lower()
+    if base.startswith(PREFIJO_DB_CAMPUS):
+        base = base[len(PREFIJO_DB_CAMPUS):]
+    nombre = normalizar_campus(re.sub(r'[^a-z0-9_-]', '_', base)[:40] or CAMPUS_DEFECTO)
+    with _lock_campus:
+        _bases_campus[nombre] = SqliteDatabase(os.path.abspath(ruta), pragmas=SQLITE_PRAGMAS)
+    return nombre
+
+
+def activar_db_campus(nombre):
+    """Vincula el proxy 'db' del hilo actual a la base del campus indicado."""
+    nombre = normalizar_campus(nombre)
+    db.initialize(obtener_db_campus(nombre))
+    db._local.campus = nombre
+    return nombre
+
+
+def campus_actual():
+    """Identificador del campus vinculado al hilo actual."""
+    return getattr(db._local, 'campus', CAMPUS_DEFECTO)
+
+
+@contextmanager
+def campus_activo(nombre):
+    """Context manager para ejecutar un bloque (ej. un hilo de generación) sobre otro campus."""
+    anterior = getattr(db._local, 'obj', None)
+    campus_anterior = campus_actual()
+    activar_db_campus(nombre)
+    try:
+        yield
+    finally:
+        db.initialize(anterior)
+        db._local.campus = campus_anterior
+
+
+# Inicializamos la base de datos (proxy por hilo, campus por defecto hasta que se active otro)
+db = TenantDatabaseProxy()
\ No newline at end of file
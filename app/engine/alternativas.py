@@ -0,0 +1,129 @@
+import logging
+from app.models import (Alternativa, AlternativaAsignacion, Curso, Horario, Profesor, ProfesorMateria,
+                        db, version_horario, registrar_cambio_horario, formato_hora)
+from app.engine.grilla import cargar_grilla
+from app.engine.eventos import publicar_cambios
+from app.engine.edicion import IndiceOcupacion
+from app.engine.solver import calcular_turno
+
+logger = logging.getLogger(__name__)
+
+# Violaciones que se informan como máximo al rechazar una alternativa
+MAX_VIOLACIONES = 5
+
+
+def _vigente():
+    """{curso_id: (profesor_id, hora_inicio)} del horario vigente."""
+    return {c_id: (p_id, hora) for c_id, p_id, hora in
+            Horario.select(Horario.curso, Horario.profesor, Horario.hora_inicio).distinct().tuples()}
+
+
+def _asignaciones(alternativa_id):
+    """{curso_id: (profesor_id, hora_inicio)} de una alternativa."""
+    return {c_id: (p_id, hora) for c_id, p_id, hora in
+            (AlternativaAsignacion
+             .select(AlternativaAsignacion.curso_id, AlternativaAsignacion.profesor_id, AlternativaAsignacion.hora_inicio)
+             .where(AlternativaAsignacion.alternativa == alternativa_id)
+             .tuples())}
+
+
+def listar_alternativas():
+    """
+    Horarios alternativos de la generación vigente, con sus términos del objetivo y
+    cuántos cursos cambian respecto del horario publicado y del vigente (con ediciones).
+    """
+    generacion_id = version_horario()[0]
+    vigente = _vigente()
+    lista = []
+    for alt in Alternativa.select().where(Alternativa.generacion == generacion_id).order_by(Alternativa.numero):
+        asignaciones = _asignaciones(alt.id)
+        cambios = sum(1 for c_id, valor in asignaciones.items() if vigente.get(c_id) != valor)
+        lista.append({
+            'numero': alt.numero,
+            'objetivo': alt.objetivo,
+            'solo_virtual': alt.solo_virtual,
+            'asignados': alt.asignados,
+            'consecutivas': alt.consecutivas,
+            'diferencia': alt.diferencia,
+            'cambios': cambios,
+            'vigente': cambios == 0 and len(asignaciones) == len(vigente),
+        })
+    return lista
+
+
+def _validar(asignaciones, grilla):
+    """
+    Comprueba la alternativa contra los datos actuales (profesores, competencias y límites pueden
+    haber cambiado desde la generación) con las mismas reglas de la edición manual.
+    """
+    cursos = {c_id: (modalidad, dias_clase) for c_id, modalidad, dias_clase in
+              Curso.select(Curso.id, Curso.modalidad, Curso.dias_clase).tuples()}
+    materias = {c_id: m_id for c_id, m_id in Horario.select(Horario.curso, Horario.materia).distinct().tuples()}
+    if set(asignaciones) != set(materias):
+        return ["Se eliminaron materias o profesores desde la generación; la alternativa ya no corresponde al horario vigente."]
+
+    limites = {p_id: (max_semana, max_dia) for p_id, max_semana, max_dia in
+               Profesor.select(Profesor.id, Profesor.max_horas_semana, Profesor.max_horas_dia).tuples()}
+    competencias = set(ProfesorMateria.select(ProfesorMateria.profesor, ProfesorMateria.materia).tuples())
+    indice = IndiceOcupacion(grilla, None, list(limites), {})
+
+    errores = []
+    for c_id, (p_id, hora) in sorted(asignaciones.items()):
+        if p_id not in limites:
+            errores.append(f"Curso {c_id}: el profesor {p_id} ya no existe.")
+            continue
+        modalidad, dias_clase = cursos[c_id]
+        b = grilla.bloque(dias_clase, hora)
+        if b is None:
+            errores.append(f"Curso {c_id}: la hora {formato_hora(hora)} ya no pertenece a la grilla.")
+            continue
+        presencial = grilla.es_presencial(modalidad)
+        violaciones = indice.violaciones(p_id, b, presencial, limites[p_id], (p_id, materias[c_id]) in competencias)
+        if violaciones:
+            errores.extend(f"Curso {c_id}: {v}" for v in violaciones)
+        else:
+            indice.poner(c_id, p_id, b, presencial, materias[c_id])
+        if len(errores) >= MAX_VIOLACIONES:
+            break
+    return errores[:MAX_VIOLACIONES]
+
+
+def aplicar_alternativa(numero):
+    """
+    Publica la alternativa 'numero' de la generación vigente: solo se reescriben los cursos cuyo
+    profesor u hora difieren del horario vigente (sin volver a resolver).
+    """
+    alt = Alternativa.get_or_none((Alternativa.generacion == version_horario()[0]) & (Alternativa.numero == numero))
+    if alt is None:
+        return {"status": "error", "message": "La alternativa no existe para el horario vigente."}
+
+    asignaciones = _asignaciones(alt.id)
+    grilla = cargar_grilla()
+    errores = _validar(asignaciones, grilla)
+    if errores:
+        return {"status": "error", "message": "La alternativa ya no es válida con los datos actuales. Regenere el horario.", "violaciones": errores}
+
+    vigente = _vigente()
+    cambios = {c_id: valor for c_id, valor in asignaciones.items() if vigente.get(c_id) != valor}
+    if cambios:
+        # Cambios solo de profesor: una actualización por profesor; los de hora (ediciones previas), por curso
+        por_profesor = {}
+        for c_id, (p_id, hora) in cambios.items():
+            if vigente[c_id][1] == hora:
+                por_profesor.setdefault(p_id, []).append(c_id)
+
+        with publicar_cambios(cursos=list(cambios)), db.atomic():
+            for p_id, c_ids in por_profesor.items():
+                Horario.update(profesor=p_id).where(Horario.curso.in_(c_ids)).execute()
+            for c_id, (p_id, hora) in cambios.items():
+                if vigente[c_id][1] == hora:
+                    continue
+                curso = Curso.get_by_id(c_id)
+                duracion = grilla.duracion_de(curso.dias_clase)
+                Horario.update(profesor=p_id, hora_inicio=hora, hora_fin=hora + duracion).where(Horario.curso == c_id).execute()
+                Curso.update(bloque_horario=hora, turno=calcular_turno(curso.modalidad, hora)).where(Curso.id == c_id).execute()
+            registrar_cambio_horario()
+
+    msg = f"Alternativa {numero} aplicada: {len(cambios)} cursos modificados."
+    logger.info(msg)
+    return {"status": "ok", "message": msg, "cambios": len(cambios)}
@@ -0,0 +1,124 @@
+import threading
+import numpy as np
+from app.models import Horario, Curso, Profesor, version_horario
+from app.database import campus_actual
+
+HORAS_DIA = 24
+# Celdas por hora de la matriz (cuartos de hora: admite bloques de 30 o 15 minutos)
+UNIDADES_HORA = 4
+UNIDADES_DIA = HORAS_DIA * UNIDADES_HORA
+N_DIAS = 7
+LIBRE, PRESENCIAL, ONLINE = 0, 1, 2
+
+# Cache por (campus, versión del horario): solo se conserva la última versión de cada campus
+_cache = {}
+_lock = threading.Lock()
+
+
+def cargar_matriz():
+    """
+    Carga el horario vigente en una matriz densa profesor × día × cuarto de hora
+    (0 libre, 1 presencial, 2 online) con una sola consulta.
+    Devuelve (ids_profesores, matriz).
+    """
+    ids = [p_id for (p_id,) in Profesor.select(Profesor.id).order_by(Profesor.id).tuples()]
+    fila = {p_id: i for i, p_id in enumerate(ids)}
+    matriz = np.zeros((len(ids), N_DIAS, UNIDADES_DIA), dtype=np.int8)
+
+    filas = (Horario
+             .select(Horario.profesor, Horario.dia, Horario.hora_inicio, Horario.hora_fin, Curso.modalidad)
+             .join(Curso, on=(Horario.curso == Curso.id))
+             .tuples())
+    for p_id, dia, inicio, fin, modalidad in filas:
+        if p_id not in fila or not 0 <= dia < N_DIAS:
+            continue
+        valor = PRESENCIAL if 'PRESENCIAL' in modalidad or modalidad == 'REGULAR' else ONLINE
+        u0, u1 = int(round(inicio * UNIDADES_HORA)), int(round(fin * UNIDADES_HORA))
+        matriz[fila[p_id], dia, max(0, u0):min(UNIDADES_DIA, u1)] = valor
+    return ids, matriz
+
+
+def gini(valores):
+    """Coeficiente de Gini (0 = carga perfectamente repartida)."""
+    v = np.sort(np.asarray(valores, dtype=float))
+    if v.size == 0 or v.sum() == 0:
+        return 0.0
+    n = v.size
+    return float((2 * np.arange(1, n + 1) - n - 1).dot(v) / (n * v.sum()))
+
+
+def calcular_metricas(matriz):
+    """Métricas vectorizadas sobre la matriz profesor × día × cuarto de hora (duraciones en horas)."""
+    ocupado = matriz > 0
+    hay_clase = ocupado.any(axis=2)                                    # profesor × día
+    horas_dia = ocupado.sum(axis=2) / UNIDADES_HORA
+
+    primera = ocupado.argmax(axis=2)
+    ultima = UNIDADES_DIA - 1 - ocupado[:, :, ::-1].argmax(axis=2)
+    amplitud = np.where(hay_clase, ultima - primera + 1, 0) / UNIDADES_HORA   # primera a última clase
+    huecos = amplitud - horas_dia                                              # horas libres entre clases
+
+    # Cambios de modalidad dentro del día: se propaga la última modalidad vista (forward-fill)
+    pos = np.where(ocupado, np.arange(UNIDADES_DIA), 0)
+    np.maximum.accumulate(pos, axis=2, out=pos)
+    rellenado = np.take_along_axis(matriz, pos, axis=2)
+    previo = np.concatenate([np.zeros_like(rellenado[:, :, :1]), rellenado[:, :, :-1]], axis=2)
+    cambios = (ocupado & (previo > 0) & (matriz != previo)).sum(axis=2)
+
+    horas = horas_dia.sum(axis=1)
+    return {
+        'horas': horas,
+        'huecos': huecos.sum(axis=1),
+        'amplitud_max': amplitud.max(axis=1),
+        'amplitud_media': np.where(hay_clase.any(axis=1), amplitud.sum(axis=1) / np.maximum(hay_clase.sum(axis=1), 1), 0),
+        'dias_con_clase': hay_clase.sum(axis=1),
+        'cambios_modalidad': cambios.sum(axis=1),
+        'gini_carga': gini(horas),
+        'varianza_carga': float(horas.var()) if horas.size else 0.0,
+    }
+
+
+def _horas(valor):
+    """Horas para el JSON: enteras si son exactas (bloques de fracciones de hora dan 1.5)."""
+    valor = round(float(valor), 2)
+    return int(valor) if valor.is_integer() else valor
+
+
+def obtener_analitica():
+    """
+    Analítica del horario vigente por profesor, cacheada por versión del horario.
+    Devuelve {'version', 'profesores': {prof_id: {...}}, 'resumen': {...}}.
+    """
+    clave = (campus_actual(), version_horario())
+    with _lock:
+        if clave in _cache:
+            return _cache[clave]
+
+    ids, matriz = cargar_matriz()
+    m = calcular_metricas(matriz)
+    resultado = {
+        'version': list(clave[1]),
+        'profesores': {
+            p_id: {
+                'horas': _horas(m['horas'][i]),
+                'huecos': _horas(m['huecos'][i]),
+                'amplitud_max': _horas(m['amplitud_max'][i]),
+                'amplitud_media': round(float(m['amplitud_media'][i]), 1),
+                'dias_con_clase': int(m['dias_con_clase'][i]),
+                'cambios_modalidad': int(m['cambios_modalidad'][i]),
+            } for i, p_id in enumerate(ids)
+        },
+        'resumen': {
+            'huecos_totales': _horas(m['huecos'].sum()),
+            'cambios_modalidad_totales': int(m['cambios_modalidad'].sum()),
+            'gini_carga': round(m['gini_carga'], 3),
+            'varianza_carga': round(m['varianza_carga'], 2),
+        }
+    }
+
+    with _lock:
+        # Se descarta la versión anterior del mismo campus
+        for k in [k for k in _cache if k[0] == clave[0]]:
+            del _cache[k]
+        _cache[clave] = resultado
+    return resultado
@@ -0,0 +1,61 @@
+import threading
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Generaciones activas por campus (single-flight: como máximo una por campus)
+_activas = {}
+_lock = threading.Lock()
+
+
+class ControlGeneracion:
+    """Estado compartido de una generación en curso: permite cancelarla desde otra petición."""
+
+    def __init__(self, campus):
+        self.campus = campus
+        self.cancelado = False
+        self._solver = None
+        self._lock = threading.Lock()
+
+    def registrar_solver(self, solver):
+        """Asocia el CpSolver en uso; se llama antes de cada Solve()."""
+        with self._lock:
+            self._solver = solver
+
+    def cancelar(self):
+        with self._lock:
+            self.cancelado = True
+            if self._solver is not None:
+                self._solver.StopSearch()
+
+
+def adquirir_generacion(campus):
+    """Reserva la generación del campus. Devuelve None si ya hay una en curso."""
+    with _lock:
+        if campus in _activas:
+            return None
+        control = ControlGeneracion(campus)
+        _activas[campus] = control
+        return control
+
+
+def liberar_generacion(control):
+    with _lock:
+        if _activas.get(control.campus) is control:
+            del _activas[control.campus]
+
+
+def cancelar_generacion(campus):
+    """Solicita detener la generación en curso del campus. Devuelve False si no había ninguna."""
+    with _lock:
+        control = _activas.get(campus)
+    if control is None:
+        return False
+    logger.info(f"Cancelación solicitada para la generación del campus '{campus}'.")
+    control.cancelar()
+    return True
+
+
+def generacion_en_curso(campus):
+    with _lock:
+        return campus in _activas
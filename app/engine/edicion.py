@@ -0,0 +1,173 @@
+import threading
+import logging
+import numpy as np
+from app.models import Profesor, ProfesorMateria, Horario, Curso, db, version_horario, registrar_cambio_horario, formato_hora
+from app.database import campus_actual
+from app.engine.grilla import MatrizOcupacion, N_DIAS, cargar_grilla
+from app.engine.eventos import publicar_cambios
+from app.engine.solver import calcular_turno
+
+logger = logging.getLogger(__name__)
+
+# Índice de ocupación por campus (se reconstruye cuando cambia la versión del horario)
+_indices = {}
+_lock = threading.Lock()
+
+
+class IndiceOcupacion:
+    """
+    Ocupación en memoria del horario vigente, sincronizada con Horario por versión:
+    matriz profesor × día × unidad de tiempo, bloques por modalidad y cargas en minutos.
+    Cada comprobación de un movimiento es de costo constante (no depende del número de cursos).
+    """
+
+    def __init__(self, grilla, version, prof_ids, cursos):
+        """cursos: {curso_id: (prof_id, bloque, presencial, materia_id)} del horario vigente."""
+        self.grilla = grilla
+        self.version = version
+        self.lock = threading.Lock()
+        self.fila = {p_id: i for i, p_id in enumerate(prof_ids)}
+        self.ocupacion = MatrizOcupacion(grilla, len(prof_ids))
+        self.carga_semana = np.zeros(len(prof_ids), dtype=int)          # minutos
+        self.carga_dia = np.zeros((len(prof_ids), N_DIAS), dtype=int)   # minutos
+        self.cursos = {}
+        for c_id, (p_id, b, presencial, m_id) in cursos.items():
+            if p_id in self.fila:
+                self.poner(c_id, p_id, b, presencial, m_id)
+
+    def _fila(self, p_id):
+        """Fila del profesor; uno que no figura en el índice (p. ej. recién creado) entra sin clases."""
+        if p_id not in self.fila:
+            self.fila[p_id] = self.ocupacion.agregar_profesor()
+            self.carga_semana = np.append(self.carga_semana, 0)
+            self.carga_dia = np.vstack([self.carga_dia, np.zeros(N_DIAS, dtype=int)])
+        return self.fila[p_id]
+
+    def poner(self, c_id, p_id, b, presencial, m_id):
+        i = self._fila(p_id)
+        min_semana, min_dia = self.grilla.carga_de(b)
+        self.ocupacion.ocupar(i, b, presencial)
+        self.carga_semana[i] += min_semana
+        self.carga_dia[i] += min_dia * self.grilla.dias[b]
+        self.cursos[c_id] = (p_id, b, presencial, m_id)
+
+    def quitar(self, c_id):
+        p_id, b, presencial, m_id = self.cursos.pop(c_id)
+        i = self.fila[p_id]
+        min_semana, min_dia = self.grilla.carga_de(b)
+        self.ocupacion.liberar(i, b)
+        self.carga_semana[i] -= min_semana
+        self.carga_dia[i] -= min_dia * self.grilla.dias[b]
+        return p_id, b, presencial, m_id
+
+    def violaciones(self, p_id, b, presencial, limites, competente):
+        """Reglas de generar_horario_automatico() que rompería el curso en (profesor, bloque)."""
+        errores = []
+        i = self._fila(p_id)
+        max_semana, max_dia = limites
+        min_semana, min_dia = self.grilla.carga_de(b)
+
+        if not competente:
+            errores.append("El profesor no está habilitado para dictar esta materia.")
+        if self.carga_semana[i] + min_semana > max_semana * 60:
+            errores.append(f"Supera la carga semanal del profesor ({(self.carga_semana[i] + min_semana) / 60:g} de {max_semana} horas).")
+        if (self.carga_dia[i] + min_dia * self.grilla.dias[b]).max() > max_dia * 60:
+            errores.append(f"Supera la carga diaria del profesor ({max_dia} horas por día).")
+        if self.ocupacion.choque(i, b):
+            errores.append("El profesor ya tiene otra clase en ese horario.")
+        elif self.ocupacion.viola_desplazamiento(i, b, presencial):
+            errores.append(f"Incumple el hueco de desplazamiento de {self.grilla.gap:g} horas entre clases presenciales y online del mismo día.")
+        return errores
+
+
+def _construir_indice(grilla, version):
+    prof_ids = [p_id for (p_id,) in Profesor.select(Profesor.id).order_by(Profesor.id).tuples()]
+    cursos = {}
+    filas = (Horario
+             .select(Horario.curso, Horario.profesor, Horario.materia, Curso.modalidad, Curso.dias_clase, Curso.bloque_horario)
+             .join(Curso)
+             .tuples())
+    for c_id, p_id, m_id, modalidad, dias_clase, hora in filas:
+        if c_id in cursos:
+            continue
+        b = grilla.bloque(dias_clase, hora)
+        if b is not None:
+            cursos[c_id] = (p_id, b, grilla.es_presencial(modalidad), m_id)
+    logger.info(f"Índice de ocupación reconstruido: {len(cursos)} cursos, {len(prof_ids)} profesores.")
+    return IndiceOcupacion(grilla, version, prof_ids, cursos)
+
+
+def obtener_indice():
+    """Índice del campus activo; se reconstruye solo si cambió la versión del horario."""
+    campus = campus_actual()
+    version = version_horario()
+    with _lock:
+        indice = _indices.get(campus)
+        if indice is None or indice.version != version:
+            indice = _construir_indice(cargar_grilla(), version)
+            _indices[campus] = indice
+        return indice
+
+
+def mover_curso(curso_id, profesor_id=None, hora=None, solo_validar=False):
+    """
+    Reasigna un curso a otro profesor y/o a otra hora de su mismo patrón de días,
+    validando al instante competencia, carga semanal/diaria, choques y la regla de desplazamiento.
+    Con solo_validar=True no persiste nada.
+    """
+    curso = Curso.get_or_none(Curso.id == curso_id)
+    if curso is None:
+        return {"status": "error", "message": "El curso no existe."}
+
+    indice = obtener_indice()
+    grilla = indice.grilla
+    with indice.lock:
+        if curso_id not in indice.cursos:
+            return {"status": "error", "message": "El curso no tiene una asignación vigente que mover. Regenere el horario para asignarlo."}
+
+        p_actual, b_actual, presencial, m_id = indice.cursos[curso_id]
+        p_nuevo = p_actual if profesor_id is None else profesor_id
+        hora_nueva = curso.bloque_horario if hora is None else hora
+        b_nuevo = grilla.bloque(curso.dias_clase, hora_nueva)
+        if b_nuevo is None:
+            return {"status": "error", "message": f"La hora {formato_hora(hora_nueva)} no es un bloque válido para {curso.dias_clase}."}
+
+        profesor = Profesor.get_or_none(Profesor.id == p_nuevo)
+        if profesor is None:
+            return {"status": "error", "message": "El profesor no existe."}
+        competente = ProfesorMateria.select().where((ProfesorMateria.profesor == p_nuevo) & (ProfesorMateria.materia == m_id)).exists()
+
+        # Se valida sin el propio curso (moverlo dentro del mismo profesor no choca consigo mismo)
+        indice.quitar(curso_id)
+        errores = indice.violaciones(p_nuevo, b_nuevo, presencial, (profesor.max_horas_semana, profesor.max_horas_dia), competente)
+        if errores or solo_validar:
+            indice.poner(curso_id, p_actual, b_actual, presencial, m_id)
+            if errores:
+                return {"status": "error", "message": "Movimiento no permitido.", "violaciones": errores}
+            return {"status": "ok", "message": "Movimiento válido."}
+
+        if version_horario() != indice.version:
+            # Otro cambio (p. ej. una generación) se publicó durante la validación
+            indice.poner(curso_id, p_actual, b_actual, presencial, m_id)
+            indice.version = None
+            return {"status": "error", "message": "El horario cambió mientras se validaba el movimiento. Intente nuevamente."}
+
+        try:
+            duracion = grilla.duracion_de(curso.dias_clase)
+            with publicar_cambios(cursos=[curso_id]), db.atomic():
+                Horario.update(profesor=p_nuevo, hora_inicio=hora_nueva, hora_fin=hora_nueva + duracion).where(Horario.curso == curso_id).execute()
+                Curso.update(bloque_horario=hora_nueva, turno=calcular_turno(curso.modalidad, hora_nueva)).where(Curso.id == curso_id).execute()
+                registrar_cambio_horario()
+        except Exception:
+            indice.poner(curso_id, p_actual, b_actual, presencial, m_id)
+            raise
+
+        indice.poner(curso_id, p_nuevo, b_nuevo, presencial, m_id)
+        # El índice queda al día con la revisión recién registrada (salvo que otro cambio se haya cruzado)
+        base = indice.version
+        nueva = version_horario()
+        indice.version = nueva if nueva == (base[0], base[1] + 1) else None
+
+    msg = f"Curso {curso.nombre} reasignado a {profesor.nombre} ({curso.dias_clase} {formato_hora(hora_nueva)})."
+    logger.info(msg)
+    return {"status": "ok", "message": msg}
@@ -0,0 +1,190 @@
+import copy
+import logging
+import math
+import multiprocessing
+import os
+import time
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from ortools.sat.python import cp_model
+from app.models import clave_hora
+from app.engine.grilla import Grilla
+from app.engine.instancia import MODALIDADES, construir_instancia
+from app.engine.solver import (validar_recursos, resolver_instancia, evaluar_asignacion,
+                               MODO_PONDERADO, PESOS_OBJETIVO, ESTADO_OPTIMO, ESTADO_FACTIBLE, ESTADO_HEURISTICO)
+
+logger = logging.getLogger(__name__)
+
+# Límite de escenarios por consulta (además del escenario base)
+MAX_ESCENARIOS = 16
+
+# Estados de un escenario sin horario
+ESTADO_INFACTIBLE = 'INFACTIBLE'
+ESTADO_SIN_SOLUCION = 'SIN_SOLUCION'
+
+NOMBRE_BASE = 'Base (configuración actual)'
+
+
+def aplicar_cambios(datos, cambios):
+    """
+    Aplica una lista de cambios (what-if) sobre los datos planos (materias, profesores, competencias)
+    de leer_datos() y devuelve una copia modificada. Tipos de cambio:
+
+      {'tipo': 'agregar_profesor', 'materias': [materia_id, ...], 'max_horas_semana', 'max_horas_dia', 'cantidad'?, 'nombre'?}
+      {'tipo': 'limite_profesor', 'profesor_id', 'max_horas_semana'?, 'max_horas_dia'?}
+      {'tipo': 'quitar_profesor', 'profesor_id'}
+      {'tipo': 'demanda', 'materia_id'?, 'modalidad'?, 'hora'?, 'factor' | 'cantidad'}
+          Sin materia/modalidad/hora el cambio aplica a todas. 'factor' multiplica la demanda
+          existente; 'cantidad' fija la demanda de una materia, modalidad y hora concretas.
+    """
+    materias, profesores, competencias = copy.deepcopy(datos)
+    materias = {m[0]: list(m) for m in materias}
+    profesores = {p[0]: list(p) for p in profesores}
+    competencias = list(competencias)
+    nuevos = 0
+
+    for cambio in cambios:
+        tipo = cambio.get('tipo')
+
+        if tipo == 'agregar_profesor':
+            ids_materias = cambio.get('materias', [])
+            faltantes = [m_id for m_id in ids_materias if m_id not in materias]
+            if not ids_materias or faltantes:
+                raise Exception(f"Cambio 'agregar_profesor': materias inválidas {faltantes or ids_materias}.")
+            for _ in range(int(cambio.get('cantidad', 1))):
+                # Ids negativos: nunca chocan con los de la base de datos
+                nuevos += 1
+                p_id = -nuevos
+                nombre = f"{cambio.get('nombre', 'Profesor nuevo')} {nuevos}"
+                profesores[p_id] = [p_id, nombre, int(cambio['max_horas_semana']), int(cambio['max_horas_dia'])]
+                competencias.extend((p_id, m_id) for m_id in ids_materias)
+
+        elif tipo in ('limite_profesor', 'quitar_profesor'):
+            p_id = cambio.get('profesor_id')
+            if p_id not in profesores:
+                raise Exception(f"Cambio '{tipo}': el profesor {p_id} no existe.")
+            if tipo == 'quitar_profesor':
+                del profesores[p_id]
+                continue
+            if 'max_horas_semana' in cambio:
+                profesores[p_id][2] = int(cambio['max_horas_semana'])
+            if 'max_horas_dia' in cambio:
+                profesores[p_id][3] = int(cambio['max_horas_dia'])
+
+        elif tipo == 'demanda':
+            m_id, modalidad, hora = cambio.get('materia_id'), cambio.get('modalidad'), cambio.get('hora')
+            if m_id is not None and m_id not in materias:
+                raise Exception(f"Cambio 'demanda': la materia {m_id} no existe.")
+            if modalidad is not None and modalidad not in MODALIDADES:
+                raise Exception(f"Cambio 'demanda': modalidad desconocida {modalidad}.")
+
+            if 'cantidad' in cambio:
+                if m_id is None or modalidad is None or hora is None:
+                    raise Exception("Cambio 'demanda': 'cantidad' requiere materia_id, modalidad y hora.")
+                horas = materias[m_id][3].setdefault(modalidad, {})
+                # Misma hora con otra escritura ('9' y '9.0'): se reemplaza la celda existente
+                for h in [h for h in horas if float(h) == float(hora)]:
+                    del horas[h]
+                horas[clave_hora(hora)] = int(cambio['cantidad'])
+                continue
+
+            factor = float(cambio.get('factor', 1))
+            for m in materias.values():
+                if m_id is not None and m[0] != m_id:
+                    continue
+                for mod, horas in m[3].items():
+                    if modalidad is not None and mod != modalidad:
+                        continue
+                    for h in horas:
+                        if hora is None or float(h) == float(hora):
+                            horas[h] = int(round(int(horas[h]) * factor))
+        else:
+            raise Exception(f"Cambio desconocido: {tipo}.")
+
+    return list(materias.values()), list(profesores.values()), competencias
+
+
+def _resolver_escenario(nombre, datos, config_grilla, modo, tiempo_limite, num_workers):
+    """Resuelve un escenario en un proceso de trabajo (sin base de datos) y devuelve su fila de comparación."""
+    inicio = time.time()
+    grilla = Grilla(config_grilla)
+    inst = construir_instancia(*datos, grilla)
+    fila = {
+        'nombre': nombre,
+        'profesores': inst.n_profesores,
+        'cursos_totales': inst.n_cursos,
+        'cursos_asignados': 0,
+        'factible': False,
+        'objetivo': None,
+        'mensaje': None,
+    }
+
+    try:
+        validar_recursos(inst, grilla)
+        resultado = resolver_instancia(inst, grilla, modo, tiempo_limite, num_workers=num_workers)
+    except Exception as e:
+        fila.update(estado=ESTADO_INFACTIBLE, mensaje=str(e), tiempo=round(time.time() - inicio, 2))
+        return fila
+
+    asignacion = resultado['asignacion']
+    if asignacion is None:
+        infactible = resultado['status'] == cp_model.INFEASIBLE
+        fila.update(estado=ESTADO_INFACTIBLE if infactible else ESTADO_SIN_SOLUCION, tiempo=round(time.time() - inicio, 2))
+        return fila
+
+    if resultado['heuristico']:
+        estado = ESTADO_HEURISTICO
+    else:
+        estado = ESTADO_OPTIMO if resultado['status'] == cp_model.OPTIMAL else ESTADO_FACTIBLE
+    terminos = evaluar_asignacion(inst, grilla, asignacion)
+
+    # Carga semanal (minutos) por profesor y utilización respecto de su máximo
+    cursos = np.fromiter(asignacion.keys(), dtype=np.int64, count=len(asignacion))
+    profes = np.fromiter(asignacion.values(), dtype=np.int64, count=len(asignacion))
+    minutos = np.bincount(profes, weights=grilla.carga_semanal[inst.curso_bloque[cursos]], minlength=inst.n_profesores)
+    uso = minutos / np.maximum(inst.max_semana * 60, 1) * 100
+
+    fila.update(
+        estado=estado,
+        factible=not resultado['heuristico'] and len(asignacion) == inst.n_cursos,
+        cursos_asignados=len(asignacion),
+        objetivo=sum(PESOS_OBJETIVO[k] * v for k, v in terminos.items()),
+        carga_media_horas=round(float(minutos.mean()) / 60, 1) if inst.n_profesores else 0,
+        carga_max_horas=round(float(minutos.max()) / 60, 1) if inst.n_profesores else 0,
+        utilizacion_media=round(float(uso.mean()), 1) if inst.n_profesores else 0,
+        sin_carga=int((minutos == 0).sum()),
+        tiempo=round(time.time() - inicio, 2),
+        **terminos
+    )
+    return fila
+
+
+def evaluar_escenarios(datos, config_grilla, escenarios, modo=MODO_PONDERADO, tiempo_total=60.0):
+    """
+    Resuelve el escenario base y cada variante en procesos de trabajo en paralelo, sin tocar
+    el horario vigente. tiempo_total es el presupuesto de reloj de toda la consulta: se reparte
+    entre las rondas de procesos necesarias y los hilos de CP-SAT entre los procesos simultáneos.
+
+    escenarios: [{'nombre', 'cambios': [...]}] (ver aplicar_cambios)
+    Devuelve la tabla comparativa: una fila por escenario, la base primero.
+    """
+    if len(escenarios) > MAX_ESCENARIOS:
+        raise Exception(f"Demasiados escenarios ({len(escenarios)}); el máximo es {MAX_ESCENARIOS}.")
+
+    variantes = [(NOMBRE_BASE, datos)]
+    for i, esc in enumerate(escenarios):
+        nombre = esc.get('nombre') or f"Escenario {i + 1}"
+        variantes.append((nombre, aplicar_cambios(datos, esc.get('cambios', []))))
+
+    cpus = os.cpu_count() or 1
+    procesos = min(len(variantes), cpus)
+    rondas = math.ceil(len(variantes) / procesos)
+    tiempo_escenario = max(1.0, tiempo_total / rondas)
+    hilos = max(1, cpus // procesos)
+    logger.info(f"Evaluando {len(variantes)} escenarios en {procesos} procesos ({tiempo_escenario:.1f}s y {hilos} hilos por escenario).")
+
+    # 'spawn': los procesos no heredan hilos ni conexiones del servidor
+    with ProcessPoolExecutor(max_workers=procesos, mp_context=multiprocessing.get_context('spawn')) as pool:
+        futuros = [pool.submit(_resolver_escenario, nombre, d, config_grilla, modo, tiempo_escenario, hilos)
+                   for nombre, d in variantes]
+        return [f.result() for f in futuros]
@@ -0,0 +1,172 @@
+import queue
+import threading
+import logging
+from contextlib import contextmanager
+from app.models import Horario, Materia, Profesor, Curso, version_horario, formato_hora
+from app.database import campus_actual
+
+logger = logging.getLogger(__name__)
+
+# Semana de referencia en la que el calendario dibuja los días 0..6
+FECHAS_BASE = {
+    0: '2023-11-20', 1: '2023-11-21', 2: '2023-11-22',
+    3: '2023-11-23', 4: '2023-11-24', 5: '2023-11-25',
+    6: '2023-11-26'
+}
+
+# Eventos pendientes por suscriptor; si un cliente lento llena su cola se le pide recargar
+TAMANO_COLA = 100
+
+# Segundos sin eventos tras los que se envía un comentario para mantener viva la conexión
+INTERVALO_KEEPALIVE = 15
+
+# Suscriptores (colas) del flujo de cambios por campus
+_suscriptores = {}
+_lock = threading.Lock()
+
+
+def etiqueta_version(version):
+    """Versión del horario como texto 'generacion-revision' (id de los eventos SSE)."""
+    return f"{version[0]}-{version[1]}"
+
+
+def suscribir(campus):
+    cola = queue.Queue(maxsize=TAMANO_COLA)
+    with _lock:
+        _suscriptores.setdefault(campus, set()).add(cola)
+    return cola
+
+
+def desuscribir(campus, cola):
+    with _lock:
+        colas = _suscriptores.get(campus)
+        if colas is not None:
+            colas.discard(cola)
+            if not colas:
+                del _suscriptores[campus]
+
+
+def hay_suscriptores(campus):
+    with _lock:
+        return bool(_suscriptores.get(campus))
+
+
+def publicar(campus, evento):
+    with _lock:
+        colas = list(_suscriptores.get(campus, ()))
+    for cola in colas:
+        try:
+            cola.put_nowait(evento)
+        except queue.Full:
+            # Cliente demasiado atrasado: se descartan sus deltas y se le pide una recarga completa
+            while True:
+                try:
+                    cola.get_nowait()
+                except queue.Empty:
+                    break
+            cola.put_nowait({'tipo': 'recarga', 'version': evento['version']})
+
+
+def evento_calendario(fila):
+    """Evento de FullCalendar para una fila del horario (ver instantanea)."""
+    (curso_id, dia, hora_inicio, hora_fin, profesor_id, materia_id,
+     materia_nombre, materia_nivel, curso_nombre, curso_turno, modalidad, profesor_nombre) = fila
+
+    start = f"{formato_hora(hora_inicio)}:00"
+
+    if 'FDS' in modalidad and (hora_fin - hora_inicio) == 8:
+        hora_fin_visual = hora_fin + 1
+    else:
+        hora_fin_visual = hora_fin
+
+    end = f"{formato_hora(hora_fin_visual)}:00"
+
+    mod_tag = ""
+    color = '#3788d8'
+
+    if 'ONLINE' in modalidad:
+        mod_tag = "[ON]"
+        if 'FDS' in modalidad:
+            color = '#fd7e14'
+        else:
+            color = '#6f42c1'
+    else:
+        if curso_turno == 'Vespertino':
+            color = '#28a745'
+        else:
+            color = '#3788d8'
+
+    tag_str = f"{mod_tag} " if mod_tag else ""
+    titulo = f"{tag_str}{materia_nombre} - {materia_nivel} ({curso_nombre})\n{profesor_nombre}"
+
+    return {
+        # Clave estable (curso, día): un curso tiene una sola clase por día
+        'id': f"{curso_id}-{dia}",
+        'title': titulo,
+        'start': f"{FECHAS_BASE[dia]}T{start}",
+        'end': f"{FECHAS_BASE[dia]}T{end}",
+        'color': color,
+        'extendedProps': {
+            'materia_id': materia_id,
+            'profesor_id': profesor_id,
+            'curso_id': curso_id,
+            'curso_turno': curso_turno,
+            'modalidad': modalidad,
+            'curso_nombre': curso_nombre
+        }
+    }
+
+
+def instantanea(cursos=None):
+    """
+    Eventos del horario vigente del campus activo: {id_evento: evento}, con una sola consulta.
+    Con 'cursos' (ids) solo se leen las clases de esos cursos.
+    """
+    condicion = Horario.dia.in_(list(FECHAS_BASE))
+    if cursos is not None:
+        condicion &= Horario.curso.in_(list(cursos))
+    filas = (Horario
+             .select(Horario.curso, Horario.dia, Horario.hora_inicio, Horario.hora_fin, Horario.profesor, Horario.materia,
+                     Materia.nombre, Materia.nivel, Curso.nombre, Curso.turno, Curso.modalidad, Profesor.nombre)
+             .join(Materia).switch(Horario).join(Profesor).switch(Horario).join(Curso)
+             .where(condicion)
+             .tuples())
+    eventos = (evento_calendario(fila) for fila in filas)
+    return {ev['id']: ev for ev in eventos}
+
+
+def diferencias(antes, despues):
+    """Deltas entre dos instantáneas: eventos agregados, modificados (movidos) y eliminados."""
+    return {
+        'agregados': [ev for k, ev in despues.items() if k not in antes],
+        'modificados': [ev for k, ev in despues.items() if k in antes and antes[k] != ev],
+        'eliminados': [k for k in antes if k not in despues],
+    }
+
+
+@contextmanager
+def publicar_cambios(recarga=False, cursos=None):
+    """
+    Envuelve un cambio del horario (fuera de la transacción) y publica el resultado a los
+    suscriptores del campus: deltas por evento, o una recarga completa si recarga=True.
+    Si el cambio solo toca cursos conocidos (ediciones), 'cursos' limita las instantáneas a
+    sus clases; las operaciones masivas comparan el horario completo.
+    Sin suscriptores no hace ningún trabajo extra.
+    """
+    campus = campus_actual()
+    if not hay_suscriptores(campus):
+        yield
+        return
+
+    base = version_horario()
+    antes = None if recarga else instantanea(cursos)
+    yield
+
+    evento = {'tipo': 'recarga' if recarga else 'delta',
+              'base': etiqueta_version(base),
+              'version': etiqueta_version(version_horario())}
+    if not recarga:
+        evento.update(diferencias(antes, instantanea(cursos)))
+        logger.info(f"Cambios del horario publicados ({campus}): {len(evento['agregados'])} agregados, "
+                    f"{len(evento['modificados'])} modificados, {len(evento['eliminados'])} eliminados.")
+    publicar(campus, evento)
@@ -0,0 +1,96 @@
+from ortools.graph.python import max_flow
+
+FUENTE = '__fuente__'
+SUMIDERO = '__sumidero__'
+
+
+class RedFlujo:
+    """Envoltorio mínimo de SimpleMaxFlow con nodos identificados por clave."""
+
+    def __init__(self):
+        self._flujo = max_flow.SimpleMaxFlow()
+        self._nodos = {}
+
+    def _id(self, clave):
+        return self._nodos.setdefault(clave, len(self._nodos))
+
+    def arco(self, origen, destino, capacidad):
+        if capacidad > 0:
+            self._flujo.add_arc_with_capacity(self._id(origen), self._id(destino), int(capacidad))
+
+    def resolver(self):
+        """Devuelve (flujo_maximo, claves del lado fuente del corte mínimo)."""
+        if FUENTE not in self._nodos:
+            return 0, set()
+        if SUMIDERO not in self._nodos:
+            # Ningún profesor recibe arcos: todo lo alcanzable desde la fuente queda de su lado del corte
+            return 0, set(self._nodos)
+        status = self._flujo.solve(self._id(FUENTE), self._id(SUMIDERO))
+        if status != self._flujo.OPTIMAL:
+            raise RuntimeError(f"Fallo en cálculo de flujo máximo (status {status}).")
+        lado_fuente = set(self._flujo.get_source_side_min_cut())
+        claves = {clave for clave, idx in self._nodos.items() if idx in lado_fuente}
+        return self._flujo.optimal_flow(), claves
+
+
+def deficit_slot(demanda, aptos):
+    """
+    Emparejamiento bipartito materia -> profesor para un único slot
+    (un profesor dicta como máximo un curso a la vez).
+
+    demanda: {materia_id: cursos requeridos en el slot}
+    aptos:   {materia_id: [prof_id competentes y con carga disponible]}
+
+    Devuelve None si hay cobertura completa, o (faltantes, materias_en_conflicto, profesores_en_conflicto)
+    donde el conflicto es el conjunto de Hall obtenido del corte mínimo.
+    """
+    total = sum(demanda.values())
+    red = RedFlujo()
+    for m_id, cantidad in demanda.items():
+        red.arco(FUENTE, ('m', m_id), cantidad)
+        for p_id in aptos.get(m_id, ()):
+            red.arco(('m', m_id), ('p', p_id), total)
+    for p_id in {p for m_id in demanda for p in aptos.get(m_id, ())}:
+        red.arco(('p', p_id), SUMIDERO, 1)
+
+    flujo, lado_fuente = red.resolver()
+    if flujo >= total:
+        return None
+
+    materias = sorted(k[1] for k in lado_fuente if isinstance(k, tuple) and k[0] == 'm')
+    profesores = sorted(k[1] for k in lado_fuente if isinstance(k, tuple) and k[0] == 'p')
+    return total - flujo, materias, profesores
+
+
+def deficit_semanal(demanda, aptos, cupos):
+    """
+    Flujo de capacidad semanal (en minutos) sobre todas las materias a la vez.
+
+    demanda: {(materia_id, patron): minutos semanales requeridos}
+    aptos:   {materia_id: [prof_id competentes]}
+    cupos:   {prof_id: {'semana': minutos máximos, 'patrones': {patron: minutos máximos por carga diaria}}}
+
+    Los cursos de patrones que cuentan para la carga diaria pasan por un nodo
+    intermedio (profesor, patrón) acotado por esa carga.
+    Devuelve None o (minutos_faltantes, materias_en_conflicto).
+    """
+    total = sum(demanda.values())
+    red = RedFlujo()
+    for (m_id, patron), minutos in demanda.items():
+        origen = ('m', m_id, patron)
+        red.arco(FUENTE, origen, minutos)
+        for p_id in aptos.get(m_id, ()):
+            acotado = patron in cupos[p_id]['patrones']
+            destino = ('pp', p_id, patron) if acotado else ('p', p_id)
+            red.arco(origen, destino, total)
+    for p_id, cupo in cupos.items():
+        for patron, minutos in cupo['patrones'].items():
+            red.arco(('pp', p_id, patron), ('p', p_id), minutos)
+        red.arco(('p', p_id), SUMIDERO, cupo['semana'])
+
+    flujo, lado_fuente = red.resolver()
+    if flujo >= total:
+        return None
+
+    materias = sorted({k[1] for k in lado_fuente if isinstance(k, tuple) and k[0] == 'm'})
+    return total - flujo, materias
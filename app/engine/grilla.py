@@ -0,0 +1,164 @@
+import json
+import logging
+import math
+import os
+import numpy as np
+from app.database import DB_FOLDER
+
+logger = logging.getLogger(__name__)
+
+# --- Grilla horaria por defecto (equivale a las reglas originales) ---
+# patrones: días en que se repite una clase, horas de inicio de cada bloque y duración (h); admiten
+#   fracciones de hora (7.5 = 07:30) múltiplos de 'resolucion_minutos'.
+#   'carga_semanal': horas que cuenta el curso para el máximo semanal (por defecto duracion * nº días).
+#   'cuenta_diaria': si las horas cuentan para el máximo diario del profesor.
+# modalidades: patrón que usa cada modalidad y si es presencial (regla de desplazamiento).
+GRILLA_DEFECTO = {
+    'resolucion_minutos': 60,
+    'gap_desplazamiento_horas': 2,
+    'patrones': {
+        'L-J': {'dias': [0, 1, 2, 3], 'bloques': [7, 9, 11, 13, 15, 17, 19], 'duracion': 2, 'cuenta_diaria': True},
+        'S': {'dias': [5], 'bloques': [8], 'duracion': 8, 'cuenta_diaria': False},
+    },
+    'modalidades': {
+        'PRESENCIAL': {'patron': 'L-J', 'presencial': True},
+        'ONLINE_LJ': {'patron': 'L-J', 'presencial': False},
+        'ONLINE_FDS': {'patron': 'S', 'presencial': False},
+    },
+}
+
+# Archivo opcional (junto a la base de datos) que reemplaza la grilla por defecto
+ARCHIVO_GRILLA = 'grilla.json'
+
+N_DIAS = 7
+
+
+class Grilla:
+    """
+    Grilla horaria construida desde configuración.
+    Cada (patrón, hora de inicio) es un bloque; las relaciones entre bloques
+    (choque, adyacencia, mezcla de modalidad prohibida) se precalculan una sola vez
+    como matrices booleanas bloque × bloque con operaciones vectorizadas.
+    """
+
+    def __init__(self, config):
+        self.config = config
+        self.resolucion = config.get('resolucion_minutos', 60)
+        self.gap = config.get('gap_desplazamiento_horas', 2)
+        self.patrones = config['patrones']
+        self.modalidades = config['modalidades']
+        self._validar()
+
+        self.bloques = [(nombre, hora) for nombre, pat in self.patrones.items() for hora in pat['bloques']]
+        self.indice = {bloque: i for i, bloque in enumerate(self.bloques)}
+        n = len(self.bloques)
+
+        pat_de = [self.patrones[nombre] for nombre, _ in self.bloques]
+        self.inicio = np.array([hora for _, hora in self.bloques], dtype=float)
+        self.duracion = np.array([pat['duracion'] for pat in pat_de], dtype=float)
+        self.fin = self.inicio + self.duracion
+
+        self.dias = np.zeros((n, N_DIAS), dtype=bool)
+        for b, pat in enumerate(pat_de):
+            self.dias[b, pat['dias']] = True
+
+        # Cargas en minutos (enteros para CP-SAT; carga_semanal puede ser fraccionaria)
+        self.carga_semanal = np.array([round(60 * pat.get('carga_semanal', pat['duracion'] * len(pat['dias']))) for pat in pat_de], dtype=int)
+        self.carga_diaria = np.array([round(60 * pat['duracion']) if pat.get('cuenta_diaria', True) else 0 for pat in pat_de], dtype=int)
+
+        # Relaciones bloque × bloque
+        comparten_dia = (self.dias.astype(np.int32) @ self.dias.T.astype(np.int32)) > 0
+        # hueco[b1, b2] < 0 si los intervalos se solapan; si no, horas libres entre ambos
+        hueco = np.maximum(self.inicio[None, :] - self.fin[:, None], self.inicio[:, None] - self.fin[None, :])
+        self.solapa = comparten_dia & (hueco < 0)
+        self.adyacente = comparten_dia & np.isclose(self.inicio[None, :], self.fin[:, None])
+        self.prohibido_mixto = comparten_dia & ~np.isclose(hueco, self.gap)
+
+        # Celdas (día × unidad de tiempo) que ocupa cada bloque, para matrices de ocupación
+        self.hora_base = float(self.inicio.min()) if n else 0.0
+        self.n_unidades = int(math.ceil((float(self.fin.max()) - self.hora_base) * 60 / self.resolucion)) if n else 0
+        self.celdas = np.zeros((n, N_DIAS, self.n_unidades), dtype=bool)
+        for b in range(n):
+            u0, u1 = self.unidad(self.inicio[b]), self.unidad(self.fin[b])
+            self.celdas[b][np.ix_(self.dias[b], np.arange(u0, u1))] = True
+
+    def _validar(self):
+        """Las horas de inicio y las duraciones deben caer en la resolución de la grilla (p. ej. 30 minutos)."""
+        for nombre, pat in self.patrones.items():
+            fuera = [h for h in list(pat['bloques']) + [pat['duracion']] if not float(h * 60 / self.resolucion).is_integer()]
+            if fuera:
+                raise ValueError(f"Patrón '{nombre}': {fuera} no son múltiplos de {self.resolucion} minutos.")
+
+    def unidad(self, hora):
+        return int(round((hora - self.hora_base) * 60 / self.resolucion))
+
+    def bloque(self, dias_clase, hora):
+        """Índice del bloque (patrón, hora) o None si no pertenece a la grilla."""
+        return self.indice.get((dias_clase, hora))
+
+    def patron_de(self, modalidad):
+        return self.modalidades[modalidad]['patron']
+
+    def es_presencial(self, modalidad):
+        return self.modalidades.get(modalidad, {}).get('presencial', 'PRESENCIAL' in modalidad)
+
+    def dias_de(self, dias_clase):
+        return self.patrones[dias_clase]['dias']
+
+    def duracion_de(self, dias_clase):
+        return self.patrones[dias_clase]['duracion']
+
+    def carga_de(self, b):
+        """(minutos semanales, minutos diarios) que suma un curso del bloque b."""
+        return int(self.carga_semanal[b]), int(self.carga_diaria[b])
+
+
+class MatrizOcupacion:
+    """
+    Ocupación densa profesor × día × unidad de tiempo (0 libre, 1 presencial, 2 online),
+    más el registro de bloques ocupados por modalidad para la regla de desplazamiento.
+    Los choques y la regla de hueco se comprueban con operaciones vectorizadas.
+    """
+    LIBRE, PRESENCIAL, ONLINE = 0, 1, 2
+
+    def __init__(self, grilla, n_profesores):
+        self.grilla = grilla
+        self.celdas = np.zeros((n_profesores, N_DIAS, grilla.n_unidades), dtype=np.int8)
+        # bloques[p, 0, b] = presencial en b; bloques[p, 1, b] = online en b
+        self.bloques = np.zeros((n_profesores, 2, len(grilla.bloques)), dtype=bool)
+
+    def choque(self, p, b):
+        return bool(self.celdas[p][self.grilla.celdas[b]].any())
+
+    def viola_desplazamiento(self, p, b, presencial):
+        otra = 1 if presencial else 0
+        return bool((self.bloques[p, otra] & self.grilla.prohibido_mixto[b]).any())
+
+    def admite(self, p, b, presencial):
+        return not self.choque(p, b) and not self.viola_desplazamiento(p, b, presencial)
+
+    def ocupar(self, p, b, presencial):
+        self.celdas[p][self.grilla.celdas[b]] = self.PRESENCIAL if presencial else self.ONLINE
+        self.bloques[p, 0 if presencial else 1, b] = True
+
+    def liberar(self, p, b):
+        self.celdas[p][self.grilla.celdas[b]] = self.LIBRE
+        self.bloques[p, :, b] = False
+
+    def agregar_profesor(self):
+        """Añade un profesor sin clases y devuelve su fila."""
+        self.celdas = np.concatenate([self.celdas, np.zeros_like(self.celdas[:1])])
+        self.bloques = np.concatenate([self.bloques, np.zeros_like(self.bloques[:1])])
+        return len(self.celdas) - 1
+
+
+def cargar_grilla():
+    """Grilla de la configuración ('grilla.json' junto a la base de datos) o la grilla por defecto."""
+    ruta = os.path.join(DB_FOLDER, ARCHIVO_GRILLA)
+    if os.path.exists(ruta):
+        try:
+            with open(ruta, encoding='utf-8') as f:
+                return Grilla(json.load(f))
+        except Exception as e:
+            logger.error(f"Error leyendo {ruta}, se usa la grilla por defecto: {str(e)}")
+    return Grilla(GRILLA_DEFECTO)
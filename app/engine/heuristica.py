@@ -0,0 +1,68 @@
+import logging
+import numpy as np
+from app.engine.grilla import MatrizOcupacion, N_DIAS
+
+logger = logging.getLogger(__name__)
+
+
+def construir_asignacion_greedy(cursos, candidatos, limites, grilla):
+    """
+    Heurística constructiva rápida (milisegundos).
+    Respeta competencia, carga semanal/diaria, choques de slot y la regla de desplazamiento.
+
+    cursos:      lista de dicts {'id', 'bloque' (índice en la grilla), 'presencial'}
+    candidatos:  {curso_id: [prof_id, ...]} (profesores competentes)
+    limites:     {prof_id: (max_horas_semana, max_horas_dia)} (las cargas se comparan en minutos)
+
+    Devuelve {curso_id: prof_id} con los cursos que pudo asignar (puede ser parcial).
+    """
+    fila = {p: i for i, p in enumerate(limites)}
+    ocupacion = MatrizOcupacion(grilla, len(fila))
+    carga_semana = {p: 0 for p in limites}  # minutos
+    carga_dia = {p: np.zeros(N_DIAS, dtype=int) for p in limites}  # minutos por día
+    asignacion = {}
+
+    # Primero los cursos más restringidos (menos candidatos)
+    orden = sorted(cursos, key=lambda c: len(candidatos.get(c['id'], ())))
+
+    for c in orden:
+        b = c['bloque']
+        es_presencial = c['presencial']
+        min_semana, min_dia = grilla.carga_de(b)
+        suma_dia = min_dia * grilla.dias[b]
+        vecinos = grilla.adyacente[b] | grilla.adyacente[:, b]
+
+        mejor, mejor_puntaje = None, None
+        for p in candidatos.get(c['id'], ()):
+            max_semana, max_dia = limites[p][0] * 60, limites[p][1] * 60
+            if carga_semana[p] + min_semana > max_semana:
+                continue
+            if (carga_dia[p] + suma_dia).max() > max_dia:
+                continue
+            i = fila[p]
+            if not ocupacion.admite(i, b, es_presencial):
+                continue
+
+            # Preferencias (mismas que la función objetivo): repartir carga,
+            # bloques consecutivos y evitar profesores "Solo Virtual".
+            puntaje = 0
+            if carga_semana[p] == 0:
+                puntaje += 20
+            puntaje += 10 * int((ocupacion.bloques[i].any(axis=0) & vecinos).sum())
+            if es_presencial and ocupacion.bloques[i, 1].any() and not ocupacion.bloques[i, 0].any():
+                puntaje += 100
+            # Desempate: el de mayor holgura semanal
+            clave = (puntaje, max_semana - carga_semana[p])
+            if mejor_puntaje is None or clave > mejor_puntaje:
+                mejor, mejor_puntaje = p, clave
+
+        if mejor is None:
+            continue
+
+        asignacion[c['id']] = mejor
+        carga_semana[mejor] += min_semana
+        carga_dia[mejor] += suma_dia
+        ocupacion.ocupar(fila[mejor], b, es_presencial)
+
+    logger.info(f"Heurística greedy: {len(asignacion)}/{len(cursos)} cursos asignados.")
+    return asignacion
@@ -0,0 +1,167 @@
+import logging
+import numpy as np
+from app.models import Profesor, Materia, ProfesorMateria, MODALIDADES, leer_desglose
+
+logger = logging.getLogger(__name__)
+
+# Las modalidades (MODALIDADES) se codifican en curso_modalidad por su posición
+
+# Bloque de un curso cuyo horario no pertenece a la grilla (lo rechaza la validación)
+SIN_BLOQUE = -1
+
+
+class Instancia:
+    """
+    Foto compacta e independiente de la base de datos de una generación.
+    Materias, profesores y cursos se identifican por su posición (índice) y se
+    guardan como arreglos paralelos de enteros; los ids de la base solo se usan
+    al persistir. Es serializable (pickle), por lo que puede enviarse a otros procesos.
+    """
+    __slots__ = (
+        # Materias
+        'materia_ids', 'materia_nombre', 'materia_nivel',
+        # Profesores
+        'prof_ids', 'prof_nombre', 'max_semana', 'max_dia',
+        # aptos[m] = índices de los profesores competentes en la materia m
+        'aptos',
+        # Cursos (arreglos paralelos)
+        'curso_materia', 'curso_modalidad', 'curso_hora', 'curso_bloque', 'curso_presencial', 'curso_orden',
+    )
+
+    @property
+    def n_cursos(self):
+        return len(self.curso_materia)
+
+    @property
+    def n_profesores(self):
+        return len(self.prof_ids)
+
+    def patron(self, c, grilla):
+        return grilla.patron_de(MODALIDADES[self.curso_modalidad[c]])
+
+    def hora(self, c):
+        """Hora de inicio del curso c: entero si es exacta."""
+        hora = float(self.curso_hora[c])
+        return int(hora) if hora.is_integer() else hora
+
+    def nombre_materia(self, m):
+        return f"{self.materia_nombre[m]} Nivel {self.materia_nivel[m]}"
+
+
+def construir_instancia(materias, profesores, competencias, grilla):
+    """
+    Construye la instancia a partir de datos planos (sin base de datos).
+
+    materias:     iterable de (id, nombre, nivel, desglose) con desglose = {modalidad: {hora: cantidad}}
+    profesores:   iterable de (id, nombre, max_horas_semana, max_horas_dia)
+    competencias: iterable de (prof_id, materia_id)
+    """
+    inst = Instancia()
+    materias = list(materias)
+    profesores = list(profesores)
+
+    inst.materia_ids = np.array([m[0] for m in materias], dtype=np.int64)
+    inst.materia_nombre = [m[1] for m in materias]
+    inst.materia_nivel = np.array([m[2] for m in materias], dtype=np.int32)
+
+    inst.prof_ids = np.array([p[0] for p in profesores], dtype=np.int64)
+    inst.prof_nombre = [p[1] for p in profesores]
+    inst.max_semana = np.array([p[2] for p in profesores], dtype=np.int32)
+    inst.max_dia = np.array([p[3] for p in profesores], dtype=np.int32)
+
+    fila_materia = {m_id: i for i, m_id in enumerate(inst.materia_ids.tolist())}
+    fila_prof = {p_id: i for i, p_id in enumerate(inst.prof_ids.tolist())}
+    aptos = [[] for _ in materias]
+    for p_id, m_id in competencias:
+        if p_id in fila_prof and m_id in fila_materia:
+            aptos[fila_materia[m_id]].append(fila_prof[p_id])
+    inst.aptos = [np.array(sorted(a), dtype=np.int32) for a in aptos]
+
+    # Un curso por unidad de demanda, en el orden de la generación original
+    # (materia, modalidad, hora); curso_orden numera los cursos de cada materia (A, B, ...)
+    materia_c, modalidad_c, hora_c, orden_c = [], [], [], []
+    for i, (_, _, _, desglose) in enumerate(materias):
+        idx_curso = 0
+        for cod, modalidad in enumerate(MODALIDADES):
+            for hora_str, cantidad in desglose.get(modalidad, {}).items():
+                for _ in range(int(cantidad)):
+                    materia_c.append(i)
+                    modalidad_c.append(cod)
+                    hora_c.append(float(hora_str))
+                    orden_c.append(idx_curso)
+                    idx_curso += 1
+
+    inst.curso_materia = np.array(materia_c, dtype=np.int32)
+    inst.curso_modalidad = np.array(modalidad_c, dtype=np.int8)
+    inst.curso_hora = np.array(hora_c, dtype=np.float32)
+    inst.curso_orden = np.array(orden_c, dtype=np.int32)
+
+    # Bloque de la grilla y regla de desplazamiento, resueltos una vez por modalidad/hora
+    bloques, presencial = [], []
+    cache = {}
+    for cod, hora in zip(modalidad_c, hora_c):
+        if (cod, hora) not in cache:
+            modalidad = MODALIDADES[cod]
+            h = int(hora) if hora.is_integer() else hora
+            b = grilla.bloque(grilla.patron_de(modalidad), h) if modalidad in grilla.modalidades else None
+            cache[(cod, hora)] = (SIN_BLOQUE if b is None else b, grilla.es_presencial(modalidad))
+        b, pres = cache[(cod, hora)]
+        bloques.append(b)
+        presencial.append(pres)
+    inst.curso_bloque = np.array(bloques, dtype=np.int32)
+    inst.curso_presencial = np.array(presencial, dtype=bool)
+    return inst
+
+
+def leer_datos():
+    """
+    Datos planos del campus activo para construir_instancia, leídos con una consulta por tabla:
+    (materias, profesores, competencias).
+    """
+    desgloses = leer_desglose()
+    materias = [(m_id, nombre, nivel, desgloses.get(m_id, {}))
+                for m_id, nombre, nivel in Materia.select(Materia.id, Materia.nombre, Materia.nivel).order_by(Materia.id).tuples()]
+
+    profesores = list(Profesor
+                      .select(Profesor.id, Profesor.nombre, Profesor.max_horas_semana, Profesor.max_horas_dia)
+                      .order_by(Profesor.id).tuples())
+    competencias = list(ProfesorMateria.select(ProfesorMateria.profesor, ProfesorMateria.materia).tuples())
+    return materias, profesores, competencias
+
+
+def cargar_instancia(grilla):
+    """Instancia del campus activo."""
+    return construir_instancia(*leer_datos(), grilla)
+
+
+# Arreglos numéricos que se guardan tal cual en el archivo de instancia
+_ARREGLOS = ('materia_ids', 'materia_nivel', 'prof_ids', 'max_semana', 'max_dia',
+             'curso_materia', 'curso_modalidad', 'curso_hora', 'curso_bloque', 'curso_presencial', 'curso_orden')
+
+
+def guardar_instancia(inst, ruta):
+    """
+    Guarda la instancia en un .npz comprimido (sin pickle): arreglos paralelos, nombres
+    y los profesores aptos por materia en formato CSR (índices concatenados + desplazamientos).
+    """
+    aptos_desde = np.cumsum([0] + [len(a) for a in inst.aptos])
+    np.savez_compressed(
+        ruta,
+        materia_nombre=np.array(inst.materia_nombre, dtype=str),
+        prof_nombre=np.array(inst.prof_nombre, dtype=str),
+        aptos_indices=np.concatenate(inst.aptos) if inst.aptos else np.zeros(0, dtype=np.int32),
+        aptos_desde=aptos_desde,
+        **{nombre: getattr(inst, nombre) for nombre in _ARREGLOS}
+    )
+
+
+def leer_instancia(ruta):
+    inst = Instancia()
+    with np.load(ruta, allow_pickle=False) as datos:
+        for nombre in _ARREGLOS:
+            setattr(inst, nombre, datos[nombre])
+        inst.materia_nombre = datos['materia_nombre'].tolist()
+        inst.prof_nombre = datos['prof_nombre'].tolist()
+        indices, desde = datos['aptos_indices'], datos['aptos_desde']
+        inst.aptos = [indices[desde[i]:desde[i + 1]] for i in range(len(desde) - 1)]
+    return inst
@@ -1,11 +1,51 @@
 import logging
-import traceback
-import json
+import math
+import time
+import numpy as np
 from ortools.sat.python import cp_model
-from app.models import Profesor, Materia, Curso, Horario, ProfesorMateria, db
+from peewee import chunked
+from app.models import Curso, Horario, Generacion, Alternativa, AlternativaAsignacion, db, formato_hora
+from app.database import campus_actual
+from app.engine.control import ControlGeneracion, adquirir_generacion, liberar_generacion
+from app.engine.heuristica import construir_asignacion_greedy
+from app.engine.factibilidad import deficit_slot, deficit_semanal
+from app.engine.grilla import cargar_grilla
+from app.engine.instancia import MODALIDADES, SIN_BLOQUE, cargar_instancia
+from app.engine.eventos import publicar_cambios
+from app.engine.volcado import volcar_ejecucion
+from app.registro import LOGGER_BUSQUEDA, ejecucion, fase, run_id_actual
 
 # Configurar logger
 logger = logging.getLogger(__name__)
+logger_busqueda = logging.getLogger(LOGGER_BUSQUEDA)
+
+# Tiempo límite total de búsqueda (segundos)
+TIEMPO_LIMITE_SEGUNDOS = 70.0
+
+# Modos de optimización
+MODO_PONDERADO = 'ponderado'    # Suma única con pesos (+10, +20, -100)
+MODO_JERARQUICO = 'jerarquico'  # Lexicográfico: un término por etapa, en orden de prioridad
+MODOS_OPTIMIZACION = (MODO_PONDERADO, MODO_JERARQUICO)
+
+# Fracción del tiempo total asignada a cada etapa del modo jerárquico
+# (el tiempo no usado por una etapa que termina antes pasa a la siguiente).
+FRACCIONES_ETAPA = (0.4, 0.3, 0.3)
+
+# Pesos de la función objetivo compuesta (el modo jerárquico solo usa el signo y el orden)
+PESOS_OBJETIVO = {'solo_virtual': -100, 'asignados': 20, 'consecutivas': 10}
+
+# Estados de una Generación persistida
+ESTADO_OPTIMO = 'OPTIMO'
+ESTADO_FACTIBLE = 'FACTIBLE'
+ESTADO_HEURISTICO = 'HEURISTICO'  # Best-effort: el solver agotó el tiempo sin solución
+
+# Horarios alternativos guardados por generación cuando se piden (incluye el publicado).
+# Son opcionales: por defecto la búsqueda principal usa todo el tiempo límite.
+NUM_ALTERNATIVAS = 5
+# Fracción mínima de cursos con otro profesor entre dos alternativas cualesquiera
+DIFERENCIA_MINIMA = 0.05
+# Fracción del tiempo límite reservada para buscar las alternativas (más el tiempo que no use la búsqueda principal)
+FRACCION_ALTERNATIVAS = 0.2
 
 def generar_etiqueta_curso(n):
     """Genera letras A, B... AA, AB... para los cursos."""
@@ -15,411 +55,637 @@ def generar_etiqueta_curso(n):
         n = (n // 26) - 1
     return result
 
-def validar_recursos(cursos, profesores):
+def calcular_turno(modalidad, hora):
+    if modalidad == 'ONLINE_FDS':
+        return 'FDS'
+    if modalidad == 'ONLINE_LJ' and hora >= 19:
+        return 'Nocturno'
+    return 'Matutino' if hora < 13 else 'Vespertino'
+
+def _nombre_materias(indices, inst):
+    return ", ".join(inst.nombre_materia(m) for m in indices)
+
+def validar_recursos(inst, grilla):
     """
     Verifica disponibilidad de profesores antes de intentar resolver.
+    Usa flujo máximo (emparejamiento bipartito) por slot y un flujo de capacidad
+    semanal sobre todas las materias, de modo que detecta también profesores
+    compartidos entre varias materias del mismo horario.
     Lanza excepción con mensaje detallado si faltan recursos.
     """
+    fuera = np.flatnonzero(inst.curso_bloque == SIN_BLOQUE)
+    if fuera.size:
+        c = int(fuera[0])
+        raise Exception(f"Imposible generar: El horario {inst.patron(c, grilla)} {formato_hora(inst.hora(c))} de {inst.nombre_materia(inst.curso_materia[c])} no pertenece a la grilla horaria configurada.")
+
+    aptos = {m: a.tolist() for m, a in enumerate(inst.aptos)}
+
+    # Demanda por (bloque, materia) en una sola pasada vectorizada
     demanda_por_slot = {}
-    demanda_horas_total = {}
+    if inst.n_cursos:
+        pares, cuenta = np.unique(np.stack([inst.curso_bloque, inst.curso_materia], axis=1), axis=0, return_counts=True)
+        for (b, m), n in zip(pares.tolist(), cuenta.tolist()):
+            demanda_por_slot.setdefault(b, {})[m] = n
+
+    # Validación 1: Cobertura por Slot (emparejamiento exacto)
+    for b, demandas in sorted(demanda_por_slot.items()):
+        # Un profesor sólo cuenta si su carga admite al menos un curso del bloque
+        min_semana, min_dia = grilla.carga_de(b)
+        disponibles = (inst.max_semana * 60 >= min_semana) & (inst.max_dia * 60 >= min_dia)
+        aptos_slot = {m: [p for p in aptos[m] if disponibles[p]] for m in demandas}
+        deficit = deficit_slot(demandas, aptos_slot)
+        if deficit:
+            faltan, en_conflicto, profes_conflicto = deficit
+            requeridos = sum(demandas[m] for m in en_conflicto)
+            dias, hora = grilla.bloques[b]
+            hora_fmt = formato_hora(hora)
+            raise Exception(f"Imposible generar: No hay suficientes profesores con disponibilidad para cubrir la demanda en {_nombre_materias(en_conflicto, inst)} en el horario {dias} {hora_fmt}. (Se necesitan {requeridos} cursos simultáneos, solo {len(profes_conflicto)} profesores competentes pueden cubrirlos; faltan {faltan}).")
+
+    # Validación 2: Capacidad Total (flujo semanal en minutos, con carga diaria por patrón)
+    carga_patron = {}
+    for nombre in grilla.patrones:
+        b = grilla.bloque(nombre, grilla.patrones[nombre]['bloques'][0])
+        carga_patron[nombre] = grilla.carga_de(b)
+    paso = math.gcd(*(sem for sem, _ in carga_patron.values())) or 1
+    cupos = {}
+    for p, (sem, dia) in enumerate(zip(inst.max_semana.tolist(), inst.max_dia.tolist())):
+        cupos[p] = {
+            'semana': (sem * 60 // paso) * paso,
+            'patrones': {nombre: (dia * 60 // m_dia) * m_sem for nombre, (m_sem, m_dia) in carga_patron.items() if m_dia > 0}
+        }
+    demanda_semanal = {}
+    for b, demandas in demanda_por_slot.items():
+        patron = grilla.bloques[b][0]
+        for m, n in demandas.items():
+            demanda_semanal[(m, patron)] = demanda_semanal.get((m, patron), 0) + n
+    demanda_minutos = {key: n * carga_patron[key[1]][0] for key, n in demanda_semanal.items()}
+    deficit = deficit_semanal(demanda_minutos, aptos, cupos)
+    if deficit:
+        faltan, en_conflicto = deficit
+        horas_necesarias = sum(mins for (m, _), mins in demanda_minutos.items() if m in en_conflicto) / 60
+        raise Exception(f"Imposible generar: La carga horaria solicitada para {_nombre_materias(en_conflicto, inst)} ({horas_necesarias:g} horas) supera la capacidad máxima combinada de los profesores disponibles (faltan {faltan / 60:g} horas). Es necesario subir horas a los profesores.")
+
+def evaluar_asignacion(inst, grilla, asignacion):
+    """
+    Valor de cada término del objetivo para {curso: profesor} (índices de la instancia),
+    calculado sin solver (sirve también para la asignación heurística).
+    """
+    n_bloques = len(grilla.bloques)
+    pres = np.zeros((inst.n_profesores, n_bloques), dtype=bool)
+    onl = np.zeros((inst.n_profesores, n_bloques), dtype=bool)
+    if asignacion:
+        cursos = np.fromiter(asignacion.keys(), dtype=np.int64, count=len(asignacion))
+        profes = np.fromiter(asignacion.values(), dtype=np.int64, count=len(asignacion))
+        es_pres = inst.curso_presencial[cursos]
+        bloques = inst.curso_bloque[cursos]
+        pres[profes[es_pres], bloques[es_pres]] = True
+        onl[profes[~es_pres], bloques[~es_pres]] = True
+    activo = (pres | onl).astype(np.int32)
+    tiene_pres, tiene_onl = pres.any(axis=1), onl.any(axis=1)
+    return {
+        'solo_virtual': int((tiene_onl & ~tiene_pres).sum()),
+        'asignados': int((tiene_pres | tiene_onl).sum()),
+        'consecutivas': int(((activo @ grilla.adyacente.astype(np.int32)) * activo).sum()),
+    }
+
+def _guardar_horario(asignacion, inst, grilla, modo, estado, mensaje, alternativas=()):
+    with fase(logger, 'persistencia'):
+        _escribir_horario(asignacion, inst, grilla, modo, estado, mensaje, alternativas)
+
+def _escribir_horario(asignacion, inst, grilla, modo, estado, mensaje, alternativas=()):
+    """
+    Persiste {curso: profesor} (índices de la instancia) y sus alternativas: reemplaza Curso/Horario
+    en una única transacción BEGIN IMMEDIATE, escribiendo cada fila una sola vez. El bloqueo de escritura
+    se toma al empezar, por lo que otro proceso que genere el mismo campus (p. ej. generar.py junto al
+    servidor) espera en lugar de intercalar sus filas; si algo falla, el horario anterior queda intacto.
+    Devuelve la Generacion registrada.
+    """
+    cursos = []
+    for c in range(inst.n_cursos):
+        modalidad = MODALIDADES[inst.curso_modalidad[c]]
+        hora = inst.hora(c)
+        cursos.append({
+            'id': c + 1,
+            'nombre': generar_etiqueta_curso(int(inst.curso_orden[c])),
+            'nivel': int(inst.materia_nivel[inst.curso_materia[c]]),
+            'turno': calcular_turno(modalidad, hora),
+            'modalidad': modalidad,
+            'bloque_horario': hora,
+            'dias_clase': inst.patron(c, grilla)
+        })
+
+    filas = []
+    for c, p in asignacion.items():
+        dias_clase = inst.patron(c, grilla)
+        hora = inst.hora(c)
+        duracion_bloque = grilla.duracion_de(dias_clase)
+        for dia_num in grilla.dias_de(dias_clase):
+            filas.append({
+                'dia': dia_num,
+                'hora_inicio': hora,
+                'hora_fin': hora + duracion_bloque,
+                'profesor_id': int(inst.prof_ids[p]),
+                'materia_id': int(inst.materia_ids[inst.curso_materia[c]]),
+                'curso_id': c + 1
+            })
+
+    # publicar_cambios envía al calendario solo las clases que cambian respecto del horario anterior.
+    # Las filas se preparan antes de abrir la transacción y los lectores (WAL) ven el horario anterior hasta el commit.
+    with publicar_cambios(), db.atomic(lock_type='IMMEDIATE'):
+        Horario.delete().execute()
+        Curso.delete().execute()
+        for lote in chunked(cursos, 200):
+            Curso.insert_many(lote).execute()
+        for lote in chunked(filas, 200):
+            Horario.insert_many(lote).execute()
+        generacion = Generacion.create(
+            modo=modo,
+            estado=estado,
+            cursos_asignados=len(asignacion),
+            cursos_totales=inst.n_cursos,
+            mensaje=mensaje
+        )
+        if alternativas:
+            _escribir_alternativas(generacion, inst, alternativas)
+    return generacion
+
+def _escribir_alternativas(generacion, inst, alternativas):
+    """
+    Guarda las alternativas [(vector curso -> profesor, terminos)] de la generación, la publicada
+    primero, y descarta las de generaciones anteriores (ya no aplicables).
+    Se llama dentro de la transacción que publica el horario.
+    """
+    horas = [inst.hora(c) for c in range(inst.n_cursos)]
+    base = alternativas[0][0]
+    anteriores = Alternativa.select(Alternativa.id).where(Alternativa.generacion != generacion.id)
+    AlternativaAsignacion.delete().where(AlternativaAsignacion.alternativa.in_(anteriores)).execute()
+    Alternativa.delete().where(Alternativa.generacion != generacion.id).execute()
+
+    for numero, (vector, terminos) in enumerate(alternativas):
+        alternativa = Alternativa.create(
+            generacion=generacion,
+            numero=numero,
+            objetivo=sum(PESOS_OBJETIVO[k] * v for k, v in terminos.items()),
+            diferencia=int((vector != base).sum()),
+            **terminos
+        )
+        filas = [{'alternativa': alternativa.id, 'curso_id': c + 1, 'profesor_id': int(inst.prof_ids[p]), 'hora_inicio': horas[c]}
+                 for c, p in enumerate(vector.tolist()) if p >= 0]
+        for lote in chunked(filas, 200):
+            AlternativaAsignacion.insert_many(lote).execute()
+    logger.info(f"{len(alternativas)} horarios alternativos guardados para la generación {generacion.id}.")
 
-    for item in cursos:
-        c = item['curso']
-        m = item['materia']
-        key_horario = f"{c.dias_clase}_{c.bloque_horario}"
+def _resolver_jerarquico(model, solver, terminos, variables, tiempo_total, control):
+    """
+    Optimización lexicográfica por etapas.
+    Cada término (en orden de prioridad) se optimiza en su propia franja de tiempo,
+    se fija su valor como restricción y la solución se usa como hint de la siguiente etapa.
+    Devuelve (status, valores) con los valores de 'variables' de la última solución válida.
+    """
+    valores = None
+    status_final = cp_model.OPTIMAL
+    tiempo_restante = tiempo_total
+
+    for idx, (nombre, expr, peso) in enumerate(terminos):
+        etapas_pendientes = len(terminos) - idx
+        fraccion = FRACCIONES_ETAPA[idx] if idx < len(FRACCIONES_ETAPA) else 1.0 / etapas_pendientes
+        fraccion_pendiente = sum(FRACCIONES_ETAPA[idx:len(terminos)]) or 1.0
+        tiempo_etapa = max(1.0, tiempo_restante * fraccion / fraccion_pendiente)
+
+        if peso > 0:
+            model.Maximize(expr)
+        else:
+            model.Minimize(expr)
+
+        if control.cancelado:
+            return cp_model.UNKNOWN, None
+        solver.parameters.max_time_in_seconds = tiempo_etapa
+        status = solver.Solve(model)
+        tiempo_restante = max(0.0, tiempo_restante - solver.WallTime())
+
+        if status not in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+            if valores is None:
+                return status, None
+            if control.cancelado:
+                return status, None
+            # Etapa sin solución en su franja: se conserva la de la etapa anterior
+            logger.warning(f"Etapa '{nombre}' sin solución ({solver.StatusName(status)}); se conserva la etapa previa.")
+            return cp_model.FEASIBLE, valores
+
+        if status != cp_model.OPTIMAL:
+            status_final = cp_model.FEASIBLE
+
+        valor = int(round(solver.ObjectiveValue()))
+        logger.info(f"Etapa '{nombre}': {valor} ({solver.StatusName(status)}, {solver.WallTime():.1f}s)")
+        valores = {k: solver.Value(v) for k, v in variables.items()}
+
+        # Fijar el nivel alcanzado y sembrar la siguiente etapa
+        if peso > 0:
+            model.Add(expr >= valor)
+        else:
+            model.Add(expr <= valor)
+        model.ClearHints()
+        for k, v in variables.items():
+            model.AddHint(v, valores[k])
+
+    return status_final, valores
+
+def construir_modelo(inst, grilla):
+    """
+    Modelo CP-SAT de la instancia (sin acceso a la base de datos).
+    Devuelve (model, asignaciones, terminos_objetivo) con asignaciones[(curso, profesor)]
+    indexadas por posición en la instancia y los términos en orden de prioridad.
+    """
+    model = cp_model.CpModel()
+    
+    # Variables de asignación: asignaciones[(curso, profesor)]
+    asignaciones = {} 
+
+    # Arreglos de la instancia como listas nativas (indexación rápida en los bucles)
+    materia_c = inst.curso_materia.tolist()
+    bloque_c = inst.curso_bloque.tolist()
+    presencial_c = inst.curso_presencial.tolist()
+    aptos = [a.tolist() for a in inst.aptos]
+    max_semana = inst.max_semana.tolist()
+    max_dia = inst.max_dia.tolist()
+    n_profesores = inst.n_profesores
+    
+    # Variables por profesor para controlar carga y modalidad.
+    # Por bloque se agrupan las variables de curso; los literales pres/onl/activo
+    # se crean solo para bloques con candidatos ('activo' es el único literal de
+    # actividad por profesor-bloque y lo comparten choque, consecutividad e indicadores).
+    prof_vars = [{
+        'bloques': {},  # b -> {'pres': [vars], 'onl': [vars]}
+        'pres': {}, 'onl': {}, 'activo': {},
+        'semanal': [], # lista de (var, minutos) para sumar carga semanal
+        'has_presencial': model.NewBoolVar(f'p{p}_has_pres'),
+        'has_online': model.NewBoolVar(f'p{p}_has_onl'),
+        'assigned_any': model.NewBoolVar(f'p{p}_assigned_any')
+    } for p in range(n_profesores)]
+
+    # 1. Crear variables de asignación y agruparlas por profesor/bloque en una sola pasada
+    for c in range(inst.n_cursos):
+        candidatos = aptos[materia_c[c]]
         
-        if key_horario not in demanda_por_slot: 
-            demanda_por_slot[key_horario] = {}
+        if not candidatos:
+            # Esto debería saltar en validar_recursos, pero por seguridad:
+            raise Exception(f"Error: Curso {inst.materia_nombre[materia_c[c]]} sin candidatos.")
+
+        clave_mod = 'pres' if presencial_c[c] else 'onl'
+        b = bloque_c[c]
+        minutos_semana, _ = grilla.carga_de(b)
+        vars_curso = []
         
-        mat_key = (m.nombre, m.nivel)
-        demanda_por_slot[key_horario][mat_key] = demanda_por_slot[key_horario].get(mat_key, 0) + 1
-
-        horas_curso = 8 # Estándar semanal
-        demanda_horas_total[mat_key] = demanda_horas_total.get(mat_key, 0) + horas_curso
-
-    # Validación 1: Cobertura por Slot
-    for slot, demandas in demanda_por_slot.items():
-        for (nombre_mat, nivel_mat), requeridos in demandas.items():
-            aptos = 0
-            for p in profesores:
-                tiene_comp = any(pm.materia.nombre == nombre_mat and pm.materia.nivel == nivel_mat for pm in p.competencias)
-                if tiene_comp:
-                    aptos += 1
+        for p in candidatos:
+            var = model.NewBoolVar(f'c{c}_p{p}')
+            asignaciones[(c, p)] = var
+            vars_curso.append(var)
+            p_data = prof_vars[p]
             
-            if aptos < requeridos:
-                dias, hora = slot.split('_')
-                hora_fmt = f"{hora}:00"
-                raise Exception(f"Imposible generar: No hay suficientes profesores con disponibilidad para cubrir la demanda en {nombre_mat} Nivel {nivel_mat} en el horario {dias} {hora_fmt}. (Se necesitan {requeridos}, hay {aptos} competentes en total).")
-
-    # Validación 2: Capacidad Total
-    for (nombre_mat, nivel_mat), horas_necesarias in demanda_horas_total.items():
-        capacidad_total_materia = 0
-        for p in profesores:
-             if any(pm.materia.nombre == nombre_mat and pm.materia.nivel == nivel_mat for pm in p.competencias):
-                 capacidad_total_materia += p.max_horas_semana
-        
-        if capacidad_total_materia < horas_necesarias:
-             raise Exception(f"Imposible generar: La carga horaria solicitada para {nombre_mat} Nivel {nivel_mat} ({horas_necesarias} horas) supera la capacidad máxima combinada de los profesores disponibles ({capacidad_total_materia} horas). Es necesario subir horas a los profesores.")
+            # Carga
+            p_data['semanal'].append((var, minutos_semana))
+            p_data['bloques'].setdefault(b, {'pres': [], 'onl': []})[clave_mod].append(var)
+
+        model.AddExactlyOne(vars_curso)
+
+    # 2. Restricciones por Profesor
+    for p in range(n_profesores):
+        p_data = prof_vars[p]
+        bloques_p = sorted(p_data['bloques'])
+        if not bloques_p:
+            model.Add(p_data['has_presencial'] == 0)
+            model.Add(p_data['has_online'] == 0)
+            model.Add(p_data['assigned_any'] == 0)
+            continue
+
+        # A) Literales de ocupación por bloque
+        for b in bloques_p:
+            grupo = p_data['bloques'][b]
+            for clave in ('pres', 'onl'):
+                if grupo[clave]:
+                    lit = model.NewBoolVar(f'p{p}_{clave}_{b}')
+                    model.Add(sum(grupo[clave]) == lit)
+                    p_data[clave][b] = lit
+            act = model.NewBoolVar(f'p{p}_act_{b}')
+            # activo es booleano: pres + onl <= 1 (no puede estar en dos lugares a la vez)
+            model.Add(sum(p_data[clave][b] for clave in ('pres', 'onl') if b in p_data[clave]) == act)
+            p_data['activo'][b] = act
+
+        idx = np.array(bloques_p)
+        # Choque entre bloques distintos que se solapan (mismo día y horas superpuestas)
+        for i, j in np.argwhere(np.triu(grilla.solapa[np.ix_(idx, idx)], 1)):
+            model.AddBoolOr([p_data['activo'][idx[i]].Not(), p_data['activo'][idx[j]].Not()])
+
+        # B) REGLA CRÍTICA DE DESPLAZAMIENTO Y MIXTO
+        # Si las modalidades son distintas el mismo día, el hueco entre ambas clases
+        # DEBE SER EXACTAMENTE el gap configurado (2h). Los pares prohibidos salen de la
+        # matriz precalculada de la grilla, filtrada a los bloques con presencial/online
+        # del profesor (sin recorrer todos los pares de slots).
+        tiene_pres = np.array([b in p_data['pres'] for b in bloques_p])
+        tiene_onl = np.array([b in p_data['onl'] for b in bloques_p])
+        mixtos = (grilla.prohibido_mixto[np.ix_(idx, idx)] & ~grilla.solapa[np.ix_(idx, idx)]
+                  & tiene_pres[:, None] & tiene_onl[None, :])
+        for i, j in np.argwhere(mixtos):
+            # Si tengo Presencial en b1, NO puedo tener Online en b2
+            model.AddBoolOr([p_data['pres'][idx[i]].Not(), p_data['onl'][idx[j]].Not()])
+
+        # C) Carga Horaria (Semanal y Diaria)
+        model.Add(sum(var * minutos for var, minutos in p_data['semanal']) <= max_semana[p] * 60)
+        # Diaria: una restricción por conjunto distinto de bloques que cuentan en un día
+        vistos = set()
+        for dia in range(grilla.dias.shape[1]):
+            del_dia = tuple(b for b in bloques_p if grilla.dias[b, dia] and grilla.carga_diaria[b] > 0)
+            if not del_dia or del_dia in vistos:
+                continue
+            vistos.add(del_dia)
+            model.Add(sum(p_data['activo'][b] * int(grilla.carga_diaria[b]) for b in del_dia) <= max_dia[p] * 60)
+
+        # D) Definir variables de uso para Objetivos
+        # has_presencial / has_online se derivan de los literales de bloque con
+        # AddMaxEquality (OR exacto); assigned_any = has_presencial OR has_online.
+        if p_data['pres']:
+            model.AddMaxEquality(p_data['has_presencial'], list(p_data['pres'].values()))
+        else:
+            model.Add(p_data['has_presencial'] == 0)
 
-def generar_horario_automatico():
+        if p_data['onl']:
+            model.AddMaxEquality(p_data['has_online'], list(p_data['onl'].values()))
+        else:
+            model.Add(p_data['has_online'] == 0)
+
+        model.AddMaxEquality(p_data['assigned_any'], [p_data['has_presencial'], p_data['has_online']])
+
+    # ==========================================
+    # OBJETIVOS (OPTIMIZACIÓN)
+    # ==========================================
+    
+    # 1. Maximizar Clases Consecutivas (bloques adyacentes de la grilla: fin de uno = inicio del otro)
+    consecutive_vars = []
+    for p in range(n_profesores):
+        act = prof_vars[p]['activo']
+        if len(act) < 2:
+            continue
+        idx = np.array(sorted(act))
+        for i, j in np.argwhere(grilla.adyacente[np.ix_(idx, idx)]):
+            b1, b2 = idx[i], idx[j]
+            # cons <=> activo[b1] AND activo[b2] (reutiliza los literales de actividad)
+            cons_var = model.NewBoolVar(f'cons_{p}_{b1}_{b2}')
+            model.AddBoolAnd([act[b1], act[b2]]).OnlyEnforceIf(cons_var)
+            model.AddBoolOr([act[b1].Not(), act[b2].Not(), cons_var])
+            consecutive_vars.append(cons_var)
+
+    # 2. Penalizar "Solo Virtual"
+    # Estrategia: Penalizar si has_online es 1 Y has_presencial es 0.
+    # O equivalentemente: Maximizar has_presencial si has_online es true.
+    # Vamos a sumar penalizaciones.
+    penalty_virtual_only_vars = []
+    for p in range(n_profesores):
+        is_virtual_only = model.NewBoolVar(f'v_only_{p}')
+        # is_virtual_only <=> has_online AND NOT has_presencial
+        model.AddBoolAnd([prof_vars[p]['has_online'], prof_vars[p]['has_presencial'].Not()]).OnlyEnforceIf(is_virtual_only)
+        model.AddBoolOr([prof_vars[p]['has_online'].Not(), prof_vars[p]['has_presencial']]).OnlyEnforceIf(is_virtual_only.Not())
+        penalty_virtual_only_vars.append(is_virtual_only)
+
+    # 3. Maximizar Profesores Asignados (Evitar 0 carga)
+    assigned_vars = [prof_vars[p]['assigned_any'] for p in range(n_profesores)]
+
+    # FUNCIÓN OBJETIVO COMPUESTA
+    # Pesos:
+    # +10 por cada par consecutivo
+    # +20 por cada profesor asignado (Spread load)
+    # -100 por cada profesor "Solo Virtual" (Evitar fuerte)
+    
+    score_consecutive = sum(consecutive_vars)
+    score_assigned = sum(assigned_vars)
+    score_virtual_penalty = sum(penalty_virtual_only_vars)
+
+    # Términos en orden de prioridad (el modo jerárquico los resuelve en este orden)
+    terminos_objetivo = [
+        ('solo_virtual', score_virtual_penalty, PESOS_OBJETIVO['solo_virtual']),
+        ('asignados', score_assigned, PESOS_OBJETIVO['asignados']),
+        ('consecutivas', score_consecutive, PESOS_OBJETIVO['consecutivas']),
+    ]
+    return model, asignaciones, terminos_objetivo
+
+def _registrar_busqueda(solver):
+    """Envía el log de búsqueda de CP-SAT al logger de búsqueda (archivo por ejecución, escrito en segundo plano)."""
+    # El callback corre en hilos de CP-SAT: el run_id se fija aquí, no desde el contexto
+    extra = {'run_id': run_id_actual()}
+    solver.parameters.log_search_progress = True
+    solver.parameters.log_to_stdout = False
+    solver.log_callback = lambda linea: logger_busqueda.info(linea, extra=extra)
+    return extra
+
+def _buscar_alternativas(inst, grilla, model, solver, asignaciones, asignacion, cantidad, tiempo_total, control):
+    """
+    Horarios alternativos por cortes de diversidad: cada nueva solución debe asignar otro profesor
+    en al menos DIFERENCIA_MINIMA de los cursos respecto de todas las anteriores. Se reutiliza el
+    modelo ya resuelto (mismo objetivo; en modo jerárquico, con los niveles de las etapas fijados)
+    y se reparte tiempo_total entre las búsquedas restantes.
+    Devuelve [(vector curso -> profesor, terminos)], la asignación publicada primero.
+    """
+    base = np.full(inst.n_cursos, -1, dtype=np.int32)
+    base[list(asignacion)] = list(asignacion.values())
+    elegidas = [(base, evaluar_asignacion(inst, grilla, asignacion))]
+    minimo = max(1, int(round(DIFERENCIA_MINIMA * inst.n_cursos)))
+
+    model.ClearHints()
+    for (c, p), var in asignaciones.items():
+        model.AddHint(var, 1 if asignacion.get(c) == p else 0)
+
+    inicio = time.perf_counter()
+    while len(elegidas) < cantidad and not control.cancelado:
+        restante = tiempo_total - (time.perf_counter() - inicio)
+        if restante < 1.0:
+            break
+        # Corte de la última solución elegida (los anteriores ya están en el modelo)
+        ultima = elegidas[-1][0]
+        model.Add(sum(asignaciones[(c, int(p))] for c, p in enumerate(ultima.tolist()) if p >= 0) <= inst.n_cursos - minimo)
+
+        solver.parameters.max_time_in_seconds = restante / (cantidad - len(elegidas))
+        status = solver.Solve(model)
+        if status not in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+            break
+        vector = np.full(inst.n_cursos, -1, dtype=np.int32)
+        for (c, p), var in asignaciones.items():
+            if solver.BooleanValue(var):
+                vector[c] = p
+        elegidas.append((vector, evaluar_asignacion(inst, grilla, dict(enumerate(vector.tolist())))))
+
+    logger.info(f"{len(elegidas)} horarios alternativos en {time.perf_counter() - inicio:.1f}s (diferencia mínima {minimo} cursos).")
+    return elegidas
+
+def resolver_instancia(inst, grilla, modo_optimizacion=MODO_PONDERADO, tiempo_limite=TIEMPO_LIMITE_SEGUNDOS, control=None,
+                       num_workers=None, log_busqueda=False, volcar=False, alternativas=1):
+    """
+    Construye y resuelve el modelo de la instancia (sin acceso a la base de datos).
+    num_workers limita los hilos de búsqueda de CP-SAT (p. ej. al resolver varias instancias en paralelo).
+    log_busqueda captura el log de búsqueda de CP-SAT en logs/solver/<run_id>.log.
+    volcar guarda el modelo (con objetivo ponderado y hints) y la instancia para reproducirlos offline.
+    alternativas > 1 busca, con parte del mismo tiempo límite, hasta ese número de horarios distintos (ver _buscar_alternativas).
+    Devuelve un dict con:
+      'status':       estado CP-SAT (cp_model.OPTIMAL, FEASIBLE, INFEASIBLE, UNKNOWN...)
+      'asignacion':   {curso: profesor} (índices de la instancia) o None
+      'heuristico':   True si la asignación es la construcción greedy (tiempo agotado)
+      'cancelado':    True si se canceló mediante 'control'
+      'alternativas': [(vector curso -> profesor, terminos)], la asignación primero (vacía si no se pidieron)
+    """
+    control = control or ControlGeneracion(None)
+
+    logger.info(f"--- 3. Configurando Modelo para {inst.n_cursos} cursos ---")
+    with fase(logger, 'modelado'):
+        model, asignaciones, terminos_objetivo = construir_modelo(inst, grilla)
+
+    # Solución inicial heurística (milisegundos): sirve como hint y como respaldo
+    with fase(logger, 'heuristica'):
+        asignacion_greedy = _asignacion_inicial(inst, grilla, model, asignaciones)
+
+    if modo_optimizacion != MODO_JERARQUICO or volcar:
+        model.Maximize(sum(expr * peso for _, expr, peso in terminos_objetivo))
+    if volcar:
+        # Un volcado fallido no debe impedir la generación
+        try:
+            with fase(logger, 'volcado'):
+                volcar_ejecucion(run_id_actual(), model, inst, grilla, {'modo': modo_optimizacion, 'tiempo_limite': tiempo_limite})
+        except Exception:
+            logger.error("No se pudo volcar el modelo", exc_info=True)
+
+    logger.info(f"--- 4. Ejecutando Solver (modo {modo_optimizacion}) ---")
+    solver = cp_model.CpSolver()
+    if num_workers:
+        solver.parameters.num_workers = num_workers
+    extra_busqueda = _registrar_busqueda(solver) if log_busqueda else None
+    control.registrar_solver(solver)
+
+    inicio = time.perf_counter()
+    tiempo_busqueda = tiempo_limite * (1 - FRACCION_ALTERNATIVAS) if alternativas > 1 else tiempo_limite
+    with fase(logger, 'busqueda'):
+        if modo_optimizacion == MODO_JERARQUICO:
+            status, valores = _resolver_jerarquico(model, solver, terminos_objetivo, asignaciones, tiempo_busqueda, control)
+        else:
+            solver.parameters.max_time_in_seconds = tiempo_busqueda
+            status = solver.Solve(model) if not control.cancelado else cp_model.UNKNOWN
+            valores = None
+            if status in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+                valores = {k: solver.Value(v) for k, v in asignaciones.items()}
+
+    resultado = {'status': status, 'asignacion': None, 'heuristico': False, 'cancelado': control.cancelado, 'alternativas': []}
+    if status in (cp_model.OPTIMAL, cp_model.FEASIBLE) and not control.cancelado:
+        logger.info(f"¡Solución encontrada! ({solver.StatusName(status)})")
+        resultado['asignacion'] = {c: p for (c, p), valor in valores.items() if valor == 1}
+        if alternativas > 1:
+            with fase(logger, 'alternativas'):
+                resultado['alternativas'] = _buscar_alternativas(
+                    inst, grilla, model, solver, asignaciones, resultado['asignacion'], alternativas,
+                    tiempo_limite - (time.perf_counter() - inicio), control)
+    if extra_busqueda is not None:
+        logger_busqueda.info(f"Fin de la búsqueda: {solver.StatusName(status)}", extra=dict(extra_busqueda, fin_busqueda=True))
+
+    if control.cancelado:
+        resultado.update(asignacion=None, alternativas=[], cancelado=True)
+        return resultado
+    if resultado['asignacion'] is None and status != cp_model.INFEASIBLE and asignacion_greedy:
+        resultado['asignacion'] = asignacion_greedy
+        resultado['heuristico'] = True
+    return resultado
+
+def _asignacion_inicial(inst, grilla, model, asignaciones):
+    """Construcción greedy cargada como hint del modelo; devuelve {curso: profesor} (puede ser parcial)."""
+    cursos_greedy = [{'id': c, 'bloque': b, 'presencial': pres}
+                     for c, (b, pres) in enumerate(zip(inst.curso_bloque.tolist(), inst.curso_presencial.tolist()))]
+    candidatos_greedy = {}
+    for (c, p) in asignaciones:
+        candidatos_greedy.setdefault(c, []).append(p)
+    limites = {p: lim for p, lim in enumerate(zip(inst.max_semana.tolist(), inst.max_dia.tolist()))}
+    asignacion_greedy = construir_asignacion_greedy(cursos_greedy, candidatos_greedy, limites, grilla)
+
+    for (c, p), var in asignaciones.items():
+        if c in asignacion_greedy:
+            model.AddHint(var, 1 if asignacion_greedy[c] == p else 0)
+    return asignacion_greedy
+
+def generar_horario_automatico(modo_optimizacion=MODO_PONDERADO, tiempo_limite=TIEMPO_LIMITE_SEGUNDOS, log_busqueda=False, volcar_modelo=False,
+                               alternativas=1):
+    """
+    Genera y publica el horario del campus activo. Todos los registros de la ejecución llevan su run_id.
+    volcar_modelo guarda modelo e instancia en <SYSTEM_ROOT>/volcados/<run_id>/ (ver reproducir.py).
+    alternativas es el número de horarios distintos (incluido el publicado) que se guardan para elegir sin volver a resolver;
+    con más de uno, la búsqueda principal cede FRACCION_ALTERNATIVAS del tiempo límite.
+    """
+    with ejecucion(campus_actual()) as run_id:
+        resultado = _generar(modo_optimizacion, tiempo_limite, log_busqueda, volcar_modelo, alternativas)
+        resultado['run_id'] = run_id
+        return resultado
+
+def _generar(modo_optimizacion, tiempo_limite, log_busqueda, volcar_modelo, alternativas):
     logger.info("--- Iniciando Motor de Asignación Optima ---")
     
+    if modo_optimizacion not in MODOS_OPTIMIZACION:
+        return {"status": "error", "message": f"Modo de optimización desconocido: {modo_optimizacion}."}
+
+    # Single-flight: una sola generación por campus a la vez
+    control = adquirir_generacion(campus_actual())
+    if control is None:
+        return {"status": "error", "ocupado": True, "message": "Ya hay una generación en curso para este campus. Espere a que termine o cancélela."}
+
     try:
         # ==========================================
-        # FASE 1: LIMPIEZA Y GENERACIÓN DE INSTANCIAS
+        # FASE 1: INSTANCIA EN MEMORIA
         # ==========================================
+        # Foto compacta de materias, profesores y cursos (una consulta por tabla).
+        # El horario vigente no se toca hasta publicar el resultado.
         logger.info("--- 1. Generando Cursos basados en Demanda ---")
-        
-        with db.atomic():
-            Horario.delete().execute()
-            Curso.delete().execute()
+        with fase(logger, 'instancia'):
+            grilla = cargar_grilla()
+            inst = cargar_instancia(grilla)
 
-        materias = list(Materia.select())
-        if not materias:
+        if not len(inst.materia_ids):
             return {"status": "error", "message": "No hay materias configuradas."}
-
-        cursos_a_asignar = []
-
-        with db.atomic():
-            for m in materias:
-                try:
-                    desglose = json.loads(m.desglose_horarios)
-                except:
-                    logger.error(f"Error leyendo JSON de materia {m.nombre}")
-                    continue
-                
-                idx_curso = 0 
-
-                # 1.1 PRESENCIAL (Lunes-Jueves)
-                for hora_str, cantidad in desglose.get("PRESENCIAL", {}).items():
-                    cant = int(cantidad)
-                    hora = int(hora_str)
-                    for _ in range(cant):
-                        nuevo_curso = Curso.create(
-                            nombre=generar_etiqueta_curso(idx_curso),
-                            nivel=m.nivel,
-                            turno='Matutino' if hora < 13 else 'Vespertino',
-                            modalidad='PRESENCIAL',
-                            bloque_horario=hora,
-                            dias_clase='L-J'
-                        )
-                        cursos_a_asignar.append({'curso': nuevo_curso, 'materia': m})
-                        idx_curso += 1
-
-                # 1.2 ONLINE L-J
-                for hora_str, cantidad in desglose.get("ONLINE_LJ", {}).items():
-                    cant = int(cantidad)
-                    hora = int(hora_str)
-                    for _ in range(cant):
-                        turno = 'Nocturno' if hora >= 19 else ('Matutino' if hora < 13 else 'Vespertino')
-                        nuevo_curso = Curso.create(
-                            nombre=generar_etiqueta_curso(idx_curso),
-                            nivel=m.nivel,
-                            turno=turno,
-                            modalidad='ONLINE_LJ',
-                            bloque_horario=hora,
-                            dias_clase='L-J'
-                        )
-                        cursos_a_asignar.append({'curso': nuevo_curso, 'materia': m})
-                        idx_curso += 1
-
-                # 1.3 ONLINE FDS
-                for hora_str, cantidad in desglose.get("ONLINE_FDS", {}).items():
-                    cant = int(cantidad)
-                    hora = int(hora_str)
-                    for _ in range(cant):
-                        nuevo_curso = Curso.create(
-                            nombre=generar_etiqueta_curso(idx_curso),
-                            nivel=m.nivel,
-                            turno='FDS',
-                            modalidad='ONLINE_FDS',
-                            bloque_horario=hora,
-                            dias_clase='S'
-                        )
-                        cursos_a_asignar.append({'curso': nuevo_curso, 'materia': m})
-                        idx_curso += 1
-
-        if not cursos_a_asignar:
+        if not inst.n_cursos:
             return {"status": "error", "message": "No se crearon cursos. Revise la configuración de demanda."}
 
         # ==========================================
         # FASE 2: PRE-VALIDACIÓN
         # ==========================================
-        profesores = list(Profesor.select())
-        validar_recursos(cursos_a_asignar, profesores)
-
-        # ==========================================
-        # FASE 3: MODELADO CP-SAT
-        # ==========================================
-        logger.info(f"--- 3. Configurando Modelo para {len(cursos_a_asignar)} cursos ---")
-        
-        model = cp_model.CpModel()
-        
-        # Variables de asignación: asignaciones[(id_curso, id_profe)]
-        asignaciones = {} 
-        
-        # Estructuras auxiliares
-        # Mapa de Slots L-J para validación de huecos/modalidad
-        # Indices: 7:0, 9:1, 11:2, 13:3, 15:4, 17:5, 19:6
-        slots_lj_map = {7:0, 9:1, 11:2, 13:3, 15:4, 17:5, 19:6}
-        num_slots_lj = 7
-        
-        # Variables por profesor para controlar carga y modalidad
-        # prof_vars[p_id]['lj_pres'][slot_idx] = BoolVar
-        prof_vars = {p.id: {
-            'lj_pres': [model.NewBoolVar(f'p{p.id}_pres_{t}') for t in range(num_slots_lj)],
-            'lj_onl': [model.NewBoolVar(f'p{p.id}_onl_{t}') for t in range(num_slots_lj)],
-            'semanal': [], # lista de vars de cursos para sumar horas
-            'diaria': [],  # lista de vars de cursos L-J
-            'has_presencial': model.NewBoolVar(f'p{p.id}_has_pres'),
-            'has_online': model.NewBoolVar(f'p{p.id}_has_onl'),
-            'assigned_any': model.NewBoolVar(f'p{p.id}_assigned_any')
-        } for p in profesores}
-
-        competencias_cache = {p.id: {pm.materia.id for pm in p.competencias} for p in profesores}
-
-        # 1. Crear variables de asignación y vincular con auxiliares
-        for item in cursos_a_asignar:
-            c = item['curso']
-            m = item['materia']
-            
-            candidatos = [p for p in profesores if m.id in competencias_cache[p.id]]
-            
-            if not candidatos:
-                # Esto debería saltar en validar_recursos, pero por seguridad:
-                return {"status": "error", "message": f"Error: Curso {m.nombre} sin candidatos."}
-
-            vars_curso = []
-            
-            for p in candidatos:
-                var = model.NewBoolVar(f'c{c.id}_p{p.id}')
-                asignaciones[(c.id, p.id)] = var
-                vars_curso.append(var)
-                
-                # Carga
-                prof_vars[p.id]['semanal'].append(var)
-                if c.dias_clase == 'L-J':
-                    prof_vars[p.id]['diaria'].append(var)
-                    
-                    # Vincular con grids de horario L-J
-                    if c.bloque_horario in slots_lj_map:
-                        slot_idx = slots_lj_map[c.bloque_horario]
-                        if c.modalidad == 'PRESENCIAL':
-                            # Si asigno este curso, el slot presencial se activa (se suman, max 1 por restricción posterior)
-                            # Usamos AddImplication para eficiencia o sumas directas.
-                            # Como solo puede haber 1 curso por slot, podemos sumar en la restricción de definición.
-                            pass 
-                        elif 'ONLINE' in c.modalidad:
-                            pass
-
-            model.Add(sum(vars_curso) == 1)
-
-        # 2. Restricciones por Profesor
-        for p in profesores:
-            p_data = prof_vars[p.id]
-            
-            # A) Definir variables de slot L-J
-            # Sumar todos los cursos presenciales para el slot t
-            for t in range(num_slots_lj):
-                # Buscar cursos presenciales L-J de este profe en este slot
-                # Esto es costoso de iterar, mejor optimizar.
-                # Lo haremos acumulando listas.
-                pass 
-
-            # Optimización de construcción de restricciones
-            # Agrupar variables por slot para el profesor
-            # slot_vars[t]['pres'] = [var_curso1, var_curso2...]
-            slot_vars = {t: {'pres': [], 'onl': []} for t in range(num_slots_lj)}
-            
-            # Recorrer asignaciones globales para llenar slot_vars local
-            # (Esto es lineal sobre el total de aristas, aceptable)
-            for item in cursos_a_asignar:
-                c = item['curso']
-                if c.dias_clase == 'L-J' and c.bloque_horario in slots_lj_map:
-                    slot_idx = slots_lj_map[c.bloque_horario]
-                    if (c.id, p.id) in asignaciones:
-                        var = asignaciones[(c.id, p.id)]
-                        if c.modalidad == 'PRESENCIAL':
-                            slot_vars[slot_idx]['pres'].append(var)
-                        elif 'ONLINE' in c.modalidad:
-                            slot_vars[slot_idx]['onl'].append(var)
-
-            # Restricciones L-J Slot a Slot
-            for t in range(num_slots_lj):
-                # 1. Definir booleano de ocupación
-                model.Add(sum(slot_vars[t]['pres']) == p_data['lj_pres'][t])
-                model.Add(sum(slot_vars[t]['onl']) == p_data['lj_onl'][t])
-                
-                # 2. No puede estar en dos lugares a la vez (Choque simple)
-                model.Add(p_data['lj_pres'][t] + p_data['lj_onl'][t] <= 1)
-
-            # B) REGLA CRÍTICA DE DESPLAZAMIENTO Y MIXTO
-            # Para cada par de slots (t1, t2), si modalidad es distinta, distancia debe ser 2 (hueco de 2h)
-            for t1 in range(num_slots_lj):
-                for t2 in range(num_slots_lj):
-                    if t1 == t2: continue
-                    
-                    distancia = abs(t1 - t2)
-                    # Slot 0(7), Slot 1(9), Slot 2(11).
-                    # Distancia 1 = Consecutivo (Gap 0h).
-                    # Distancia 2 = Gap 2h.
-                    # Distancia > 2 = Gap > 2h.
-                    
-                    # REGLA: Si las modalidades son distintas, la distancia DEBE SER EXACTAMENTE 2.
-                    # Si distancia != 2, prohibido mezclar.
-                    if distancia != 2:
-                        # Si tengo Presencial en t1, NO puedo tener Online en t2
-                        model.Add(p_data['lj_pres'][t1] + p_data['lj_onl'][t2] <= 1)
-                        # Viceversa
-                        model.Add(p_data['lj_onl'][t1] + p_data['lj_pres'][t2] <= 1)
-
-            # C) Carga Horaria (Semanal y Diaria)
-            if p_data['semanal']:
-                model.Add(sum(p_data['semanal']) * 8 <= p.max_horas_semana)
-            if p_data['diaria']:
-                model.Add(sum(p_data['diaria']) * 2 <= p.max_horas_dia)
-
-            # D) Definir variables de uso para Objetivos
-            # assigned_any
-            all_vars = p_data['semanal'] # Lista de todas las asignaciones posibles
-            if all_vars:
-                model.Add(sum(all_vars) > 0).OnlyEnforceIf(p_data['assigned_any'])
-                model.Add(sum(all_vars) == 0).OnlyEnforceIf(p_data['assigned_any'].Not())
-            else:
-                model.Add(p_data['assigned_any'] == 0)
-
-            # has_presencial / has_online (Globales, incluyendo FDS si aplica, o solo L-J?)
-            # El usuario dice "No quiero profesor dando solo virtual".
-            # Usaremos todas las variables asignadas clasificadas.
-            all_pres_vars = []
-            all_onl_vars = []
-            for item in cursos_a_asignar:
-                c = item['curso']
-                if (c.id, p.id) in asignaciones:
-                    v = asignaciones[(c.id, p.id)]
-                    if 'PRESENCIAL' in c.modalidad: all_pres_vars.append(v)
-                    else: all_onl_vars.append(v)
-            
-            if all_pres_vars:
-                model.Add(sum(all_pres_vars) > 0).OnlyEnforceIf(p_data['has_presencial'])
-                model.Add(sum(all_pres_vars) == 0).OnlyEnforceIf(p_data['has_presencial'].Not())
-            else:
-                model.Add(p_data['has_presencial'] == 0)
-                
-            if all_onl_vars:
-                model.Add(sum(all_onl_vars) > 0).OnlyEnforceIf(p_data['has_online'])
-                model.Add(sum(all_onl_vars) == 0).OnlyEnforceIf(p_data['has_online'].Not())
-            else:
-                model.Add(p_data['has_online'] == 0)
+        with fase(logger, 'validacion'):
+            validar_recursos(inst, grilla)
 
         # ==========================================
-        # FASE 4: OBJETIVOS (OPTIMIZACIÓN)
+        # FASE 3: MODELADO Y SOLUCIÓN
         # ==========================================
-        
-        # 1. Maximizar Clases Consecutivas (Solo L-J tiene sentido de consecutividad)
-        consecutive_vars = []
-        for p in profesores:
-            p_data = prof_vars[p.id]
-            for t in range(num_slots_lj - 1):
-                # Crear variable que sea 1 si t y t+1 están activos (cualquier modalidad)
-                is_active_t = model.NewBoolVar(f'act_{p.id}_{t}')
-                is_active_next = model.NewBoolVar(f'act_{p.id}_{t+1}')
-                
-                # Vincular active con pres/onl
-                model.Add(p_data['lj_pres'][t] + p_data['lj_onl'][t] == 1).OnlyEnforceIf(is_active_t)
-                model.Add(p_data['lj_pres'][t] + p_data['lj_onl'][t] == 0).OnlyEnforceIf(is_active_t.Not())
-                
-                model.Add(p_data['lj_pres'][t+1] + p_data['lj_onl'][t+1] == 1).OnlyEnforceIf(is_active_next)
-                model.Add(p_data['lj_pres'][t+1] + p_data['lj_onl'][t+1] == 0).OnlyEnforceIf(is_active_next.Not())
-                
-                # Bonificar si ambos activos
-                cons_var = model.NewBoolVar(f'cons_{p.id}_{t}')
-                model.Add(is_active_t + is_active_next == 2).OnlyEnforceIf(cons_var)
-                model.Add(is_active_t + is_active_next < 2).OnlyEnforceIf(cons_var.Not())
-                consecutive_vars.append(cons_var)
-
-        # 2. Penalizar "Solo Virtual"
-        # Estrategia: Penalizar si has_online es 1 Y has_presencial es 0.
-        # O equivalentemente: Maximizar has_presencial si has_online es true.
-        # Vamos a sumar penalizaciones.
-        penalty_virtual_only_vars = []
-        for p in profesores:
-            is_virtual_only = model.NewBoolVar(f'v_only_{p.id}')
-            # is_virtual_only <=> has_online AND NOT has_presencial
-            model.AddBoolAnd([prof_vars[p.id]['has_online'], prof_vars[p.id]['has_presencial'].Not()]).OnlyEnforceIf(is_virtual_only)
-            model.AddBoolOr([prof_vars[p.id]['has_online'].Not(), prof_vars[p.id]['has_presencial']]).OnlyEnforceIf(is_virtual_only.Not())
-            penalty_virtual_only_vars.append(is_virtual_only)
-
-        # 3. Maximizar Profesores Asignados (Evitar 0 carga)
-        assigned_vars = [prof_vars[p.id]['assigned_any'] for p in profesores]
-
-        # FUNCIÓN OBJETIVO COMPUESTA
-        # Pesos:
-        # +10 por cada par consecutivo
-        # +20 por cada profesor asignado (Spread load)
-        # -100 por cada profesor "Solo Virtual" (Evitar fuerte)
-        
-        score_consecutive = sum(consecutive_vars)
-        score_assigned = sum(assigned_vars)
-        score_virtual_penalty = sum(penalty_virtual_only_vars)
-        
-        model.Maximize(
-            (score_consecutive * 10) + 
-            (score_assigned * 20) - 
-            (score_virtual_penalty * 100)
-        )
+        resultado = resolver_instancia(inst, grilla, modo_optimizacion, tiempo_limite, control,
+                                       log_busqueda=log_busqueda, volcar=volcar_modelo, alternativas=alternativas)
+        status = resultado['status']
+        asignacion = resultado['asignacion']
 
-        # ==========================================
-        # FASE 5: SOLUCIÓN
-        # ==========================================
-        logger.info("--- 4. Ejecutando Solver ---")
-        solver = cp_model.CpSolver()
-        solver.parameters.max_time_in_seconds = 70.0
-        status = solver.Solve(model)
+        if resultado['cancelado']:
+            msg = "Generación cancelada por el usuario. El horario vigente no fue modificado."
+            logger.warning(msg)
+            return {"status": "error", "cancelado": True, "message": msg}
 
         if status == cp_model.OPTIMAL or status == cp_model.FEASIBLE:
-            logger.info(f"¡Solución encontrada! ({solver.StatusName(status)})")
-            count = 0
-            with db.atomic():
-                for (c_id, p_id), var in asignaciones.items():
-                    if solver.Value(var) == 1:
-                        item = next(x for x in cursos_a_asignar if x['curso'].id == c_id)
-                        curso = item['curso']
-                        materia = item['materia']
-                        
-                        dias_db = []
-                        duracion_bloque = 0
-                        
-                        if curso.dias_clase == 'L-J':
-                            dias_db = [0, 1, 2, 3] 
-                            duracion_bloque = 2
-                        elif curso.dias_clase == 'S': 
-                            dias_db = [5]
-                            duracion_bloque = 8 
-                        
-                        for dia_num in dias_db:
-                            Horario.create(
-                                dia=dia_num,
-                                hora_inicio=curso.bloque_horario,
-                                hora_fin=curso.bloque_horario + duracion_bloque,
-                                profesor_id=p_id,
-                                materia_id=materia.id,
-                                curso_id=curso.id
-                            )
-                        count += 1
-            
-            msg = f"Horario generado exitosamente. {count} cursos asignados."
+            estado = ESTADO_OPTIMO if status == cp_model.OPTIMAL else ESTADO_FACTIBLE
+            msg = f"Horario generado exitosamente. {len(asignacion)} cursos asignados."
+            _guardar_horario(asignacion, inst, grilla, modo_optimizacion, estado, msg, resultado['alternativas'])
             logger.info(msg)
-            return {"status": "ok", "message": msg}
+            return {"status": "ok", "message": msg, "alternativas": len(resultado['alternativas'])}
         
         elif status == cp_model.INFEASIBLE:
             msg = "Imposible generar: Conflicto insalvable de restricciones (Gap de Desplazamiento o Disponibilidad). Intente añadir profesores."
             logger.error(msg)
             return {"status": "error", "message": msg}
+        elif resultado['heuristico']:
+            # Tiempo agotado: se persiste la construcción heurística, marcada como best-effort
+            msg = (f"Tiempo de espera agotado sin solución del optimizador. Se guardó un horario heurístico "
+                   f"(best-effort) con {len(asignacion)} de {inst.n_cursos} cursos asignados. Revíselo antes de publicarlo.")
+            _guardar_horario(asignacion, inst, grilla, modo_optimizacion, ESTADO_HEURISTICO, msg)
+            logger.warning(msg)
+            return {"status": "ok", "heuristico": True, "message": msg}
         else:
             return {"status": "error", "message": "Tiempo de espera agotado sin solución óptima."}
 
     except Exception as e:
-        error_detail = traceback.format_exc()
-        logger.critical(f"Excepción en solver: {str(e)}\n{error_detail}")
-        return {"status": "error", "message": str(e)}
\ No newline at end of file
+        logger.critical(f"Excepción en solver: {str(e)}", exc_info=True)
+        return {"status": "error", "message": str(e)}
+    finally:
+        liberar_generacion(control)
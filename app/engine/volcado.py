@@ -0,0 +1,61 @@
+import datetime
+import json
+import logging
+import os
+from google.protobuf import text_format
+from ortools.sat import cp_model_pb2
+from ortools.sat.python import cp_model
+from app.database import SYSTEM_ROOT
+from app.engine.grilla import Grilla
+from app.engine.instancia import guardar_instancia, leer_instancia
+
+logger = logging.getLogger(__name__)
+
+# Volcados de ejecuciones para reproducir offline: <SYSTEM_ROOT>/volcados/<run_id>/
+CARPETA_VOLCADOS = os.path.join(SYSTEM_ROOT, 'volcados')
+
+ARCHIVO_MODELO = 'modelo.pb'
+ARCHIVO_INSTANCIA = 'instancia.npz'
+ARCHIVO_GRILLA = 'grilla.json'
+ARCHIVO_META = 'meta.json'
+
+
+def volcar_ejecucion(run_id, model, inst, grilla, meta):
+    """
+    Guarda el CpModel (proto binario, con objetivo y hints tal como se resuelve),
+    la instancia compacta, la grilla y los metadatos de la ejecución. Devuelve la carpeta.
+    """
+    carpeta = os.path.join(CARPETA_VOLCADOS, run_id or f"{datetime.datetime.now():%Y%m%d-%H%M%S}")
+    os.makedirs(carpeta, exist_ok=True)
+
+    if not model.ExportToFile(os.path.join(carpeta, ARCHIVO_MODELO)):
+        raise Exception(f"No se pudo volcar el modelo en {carpeta}.")
+    guardar_instancia(inst, os.path.join(carpeta, ARCHIVO_INSTANCIA))
+    with open(os.path.join(carpeta, ARCHIVO_GRILLA), 'w', encoding='utf-8') as f:
+        json.dump(grilla.config, f, ensure_ascii=False, indent=2)
+    with open(os.path.join(carpeta, ARCHIVO_META), 'w', encoding='utf-8') as f:
+        json.dump(dict(meta, run_id=run_id, fecha=datetime.datetime.now().isoformat(timespec='seconds'),
+                       cursos=inst.n_cursos, profesores=inst.n_profesores), f, ensure_ascii=False, indent=2)
+
+    logger.info(f"Modelo e instancia volcados en {carpeta}")
+    return carpeta
+
+
+def cargar_modelo(carpeta):
+    """CpModel desde el proto binario (se lee con protobuf y se copia al modelo por formato de texto)."""
+    proto = cp_model_pb2.CpModelProto()
+    with open(os.path.join(carpeta, ARCHIVO_MODELO), 'rb') as f:
+        proto.ParseFromString(f.read())
+    model = cp_model.CpModel()
+    model.Proto().parse_text_format(text_format.MessageToString(proto))
+    return model
+
+
+def cargar_volcado(carpeta):
+    """Devuelve (instancia, grilla, meta) de un volcado."""
+    inst = leer_instancia(os.path.join(carpeta, ARCHIVO_INSTANCIA))
+    with open(os.path.join(carpeta, ARCHIVO_GRILLA), encoding='utf-8') as f:
+        grilla = Grilla(json.load(f))
+    with open(os.path.join(carpeta, ARCHIVO_META), encoding='utf-8') as f:
+        meta = json.load(f)
+    return inst, grilla, meta
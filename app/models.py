@@ -1,5 +1,16 @@
-from peewee import Model, CharField, IntegerField, ForeignKeyField, TextField
-from app.database import db
+import datetime
+import json
+import logging
+import re
+import threading
+from peewee import Model, CharField, IntegerField, FloatField, ForeignKeyField, TextField, DateTimeField, fn
+from playhouse.migrate import SqliteMigrator, migrate
+from app.database import db, activar_db_campus
+
+logger = logging.getLogger(__name__)
+
+# Modalidades de la demanda, en el orden en que se generan los cursos
+MODALIDADES = ('PRESENCIAL', 'ONLINE_LJ', 'ONLINE_FDS')
 
 class BaseModel(Model):
     class Meta:
@@ -8,7 +19,19 @@ class BaseModel(Model):
 class Materia(BaseModel):
     nombre = CharField()
     nivel = IntegerField()
-    desglose_horarios = TextField(default='{}') 
+    # Formato anterior de la demanda (JSON); se migra a DemandaMateria y queda en '{}'
+    desglose_horarios = TextField(default='{}')
+
+class DemandaMateria(BaseModel):
+    # Cursos pedidos de una materia por modalidad y hora de inicio
+    materia = ForeignKeyField(Materia, backref='demanda')
+    modalidad = CharField()
+    hora = FloatField()
+    cantidad = IntegerField()
+
+    class Meta:
+        table_name = 'demanda_materia'
+        indexes = ((('materia', 'modalidad', 'hora'), True),)
 
 class Profesor(BaseModel):
     nombre = CharField()
@@ -25,13 +48,234 @@ class Curso(BaseModel):
     turno = CharField()
     modalidad = CharField()
     
-    bloque_horario = IntegerField(null=True)
+    # Horas como número real (7.5 = 07:30) para admitir bloques de fracciones de hora
+    bloque_horario = FloatField(null=True)
     dias_clase = CharField(null=True)
 
 class Horario(BaseModel):
     dia = IntegerField()
-    hora_inicio = IntegerField()
-    hora_fin = IntegerField()
+    hora_inicio = FloatField()
+    hora_fin = FloatField()
     profesor = ForeignKeyField(Profesor, backref='asignaciones')
     materia = ForeignKeyField(Materia, backref='horarios')
-    curso = ForeignKeyField(Curso, backref='horarios')
\ No newline at end of file
+    curso = ForeignKeyField(Curso, backref='horarios')
+class Generacion(BaseModel):
+    # Registro de cada horario persistido (versión vigente = último registro).
+    # estado: OPTIMO | FACTIBLE | HEURISTICO (best-effort por tiempo agotado) | SIN_GENERAR (base)
+    fecha = DateTimeField(default=datetime.datetime.now)
+    modo = CharField()
+    estado = CharField()
+    cursos_asignados = IntegerField()
+    cursos_totales = IntegerField()
+    mensaje = TextField(null=True)
+    # Se incrementa con cada cambio del horario fuera del motor (ediciones, borrados, profesores)
+    revision = IntegerField(default=0)
+
+# Modo de la generación base que se crea al preparar una base sin generaciones
+MODO_BASE = 'base'
+
+# --- Horarios alternativos ---
+# Soluciones distintas encontradas en la misma búsqueda de una generación (la 0 es la publicada);
+# elegir otra solo reescribe los profesores de los cursos que cambian.
+class Alternativa(BaseModel):
+    generacion = ForeignKeyField(Generacion, backref='alternativas')
+    numero = IntegerField()
+    objetivo = IntegerField()
+    solo_virtual = IntegerField()
+    asignados = IntegerField()
+    consecutivas = IntegerField()
+    # Cursos con otro profesor respecto de la alternativa 0
+    diferencia = IntegerField()
+
+    class Meta:
+        indexes = ((('generacion', 'numero'), True),)
+
+class AlternativaAsignacion(BaseModel):
+    alternativa = ForeignKeyField(Alternativa, backref='asignaciones')
+    curso_id = IntegerField()
+    profesor_id = IntegerField()
+    hora_inicio = FloatField()
+
+    class Meta:
+        table_name = 'alternativa_asignacion'
+
+MODELOS = [Profesor, Materia, DemandaMateria, Curso, Horario, ProfesorMateria, Generacion, Alternativa, AlternativaAsignacion]
+
+# Columnas añadidas después de la creación original de cada tabla
+COLUMNAS_MIGRADAS = [
+    (Generacion, 'revision'),
+]
+
+# Columnas de horas creadas como enteras que pasan a reales (bloques de fracciones de hora)
+COLUMNAS_REALES = [
+    (Curso, 'bloque_horario'),
+    (Horario, 'hora_inicio'),
+    (Horario, 'hora_fin'),
+    (AlternativaAsignacion, 'hora_inicio'),
+]
+
+# Tablas que ya no se usan y se eliminan de las bases existentes
+TABLAS_OBSOLETAS = ['curso_staging', 'horario_staging']
+
+_campus_preparados = set()
+_lock_preparacion = threading.Lock()
+
+def _migrar_esquema():
+    """
+    Lleva las bases existentes al esquema actual (create_tables no altera tablas): añade las columnas
+    nuevas, pasa a reales las columnas de horas enteras y elimina las tablas obsoletas.
+    """
+    migrator = SqliteMigrator(db)
+    operaciones = []
+    for modelo, campo in COLUMNAS_MIGRADAS:
+        existentes = {c.name for c in db.get_columns(modelo._meta.table_name)}
+        columna = modelo._meta.fields[campo]
+        if columna.column_name not in existentes:
+            operaciones.append(migrator.add_column(modelo._meta.table_name, columna.column_name, columna))
+    if operaciones:
+        migrate(*operaciones)
+
+    a_real = {}
+    for modelo, campo in COLUMNAS_REALES:
+        tabla = modelo._meta.table_name
+        tipos = {c.name: c.data_type.upper() for c in db.get_columns(tabla)}
+        columna = modelo._meta.fields[campo].column_name
+        if tipos.get(columna) == 'INTEGER':
+            a_real.setdefault(tabla, []).append(columna)
+    if a_real:
+        # SQLite reconstruye la tabla para cambiar un tipo: las claves foráneas se desactivan mientras tanto
+        db.pragma('foreign_keys', 0)
+        try:
+            with db.atomic():
+                for tabla, columnas in a_real.items():
+                    _columnas_a_real(tabla, columnas)
+        finally:
+            db.pragma('foreign_keys', 1)
+    for tabla in TABLAS_OBSOLETAS:
+        db.execute_sql(f'DROP TABLE IF EXISTS "{tabla}"')
+
+def _columnas_a_real(tabla, columnas):
+    """Reconstruye 'tabla' con las columnas indicadas como REAL, conservando filas, claves e índices."""
+    sql, = db.execute_sql("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?", (tabla,)).fetchone()
+    indices = [fila[0] for fila in db.execute_sql(
+        "SELECT sql FROM sqlite_master WHERE type = 'index' AND tbl_name = ? AND sql IS NOT NULL", (tabla,)).fetchall()]
+    temporal = f'{tabla}__migracion'
+    sql = sql.replace(f'CREATE TABLE "{tabla}"', f'CREATE TABLE "{temporal}"', 1)
+    for columna in columnas:
+        sql = re.sub(rf'"{columna}" INTEGER\b', f'"{columna}" REAL', sql)
+    db.execute_sql(sql)
+    db.execute_sql(f'INSERT INTO "{temporal}" SELECT * FROM "{tabla}"')
+    db.execute_sql(f'DROP TABLE "{tabla}"')
+    db.execute_sql(f'ALTER TABLE "{temporal}" RENAME TO "{tabla}"')
+    for indice in indices:
+        db.execute_sql(indice)
+    logger.info(f"Columnas {', '.join(columnas)} de '{tabla}' migradas a REAL.")
+
+def _migrar_demanda():
+    """Pasa la demanda guardada como JSON en Materia.desglose_horarios a DemandaMateria (una sola vez por materia)."""
+    pendientes = (Materia
+                  .select(Materia.id, Materia.nombre, Materia.desglose_horarios)
+                  .where(Materia.desglose_horarios.not_in(['', '{}']))
+                  .tuples())
+    with db.atomic():
+        for m_id, nombre, desglose in pendientes:
+            try:
+                guardar_demanda(m_id, json.loads(desglose))
+            except Exception:
+                logger.error(f"Error migrando la demanda de la materia {nombre}; se conserva el JSON original.", exc_info=True)
+                continue
+            Materia.update(desglose_horarios='{}').where(Materia.id == m_id).execute()
+
+def clave_hora(hora):
+    """Hora como clave del desglose: '8', '8.5'."""
+    hora = float(hora)
+    return str(int(hora)) if hora.is_integer() else str(hora)
+
+def formato_hora(hora):
+    """Hora (7.5) como texto de reloj: '07:30'."""
+    minutos = int(round(float(hora) * 60))
+    return f"{minutos // 60:02d}:{minutos % 60:02d}"
+
+def guardar_demanda(materia_id, desglose):
+    """Reemplaza la demanda de una materia. desglose = {modalidad: {hora: cantidad}} (se omiten cantidades 0)."""
+    filas = []
+    for modalidad, horas in desglose.items():
+        if modalidad not in MODALIDADES:
+            raise Exception(f"Modalidad desconocida en la demanda: {modalidad}.")
+        for hora, cantidad in horas.items():
+            cantidad = int(cantidad or 0)
+            if cantidad < 0:
+                raise Exception(f"Cantidad negativa en la demanda ({modalidad} {formato_hora(hora)}).")
+            if cantidad:
+                filas.append({'materia': materia_id, 'modalidad': modalidad, 'hora': float(hora), 'cantidad': cantidad})
+    DemandaMateria.delete().where(DemandaMateria.materia == materia_id).execute()
+    if filas:
+        DemandaMateria.insert_many(filas).execute()
+
+def leer_desglose():
+    """Demanda de todas las materias con una sola consulta: {materia_id: {modalidad: {hora: cantidad}}}."""
+    desgloses = {}
+    filas = (DemandaMateria
+             .select(DemandaMateria.materia, DemandaMateria.modalidad, DemandaMateria.hora, DemandaMateria.cantidad)
+             .order_by(DemandaMateria.materia, DemandaMateria.hora)
+             .tuples())
+    for m_id, modalidad, hora, cantidad in filas:
+        desgloses.setdefault(m_id, {}).setdefault(modalidad, {})[clave_hora(hora)] = cantidad
+    return desgloses
+
+def totales_demanda():
+    """Cursos pedidos por materia y modalidad (agregado SQL): {materia_id: {modalidad: total}}."""
+    totales = {}
+    filas = (DemandaMateria
+             .select(DemandaMateria.materia, DemandaMateria.modalidad, fn.SUM(DemandaMateria.cantidad))
+             .group_by(DemandaMateria.materia, DemandaMateria.modalidad)
+             .tuples())
+    for m_id, modalidad, total in filas:
+        totales.setdefault(m_id, {})[modalidad] = total
+    return totales
+
+def _crear_generacion_base():
+    """
+    Registra una generación base en las bases sin generaciones: así la versión del horario
+    siempre tiene un registro donde contar revisiones (cachés e índices se invalidan aunque
+    el motor nunca se haya ejecutado).
+    """
+    if not Generacion.select().exists():
+        Generacion.create(modo=MODO_BASE, estado='SIN_GENERAR', cursos_asignados=0, cursos_totales=0,
+                          mensaje='Sin horario generado')
+
+def version_horario():
+    """Versión del horario vigente: (id de la última generación, revisión); (0, 0) si no hay."""
+    ultima = Generacion.select(Generacion.id, Generacion.revision).order_by(Generacion.id.desc()).first()
+    return (ultima.id, ultima.revision) if ultima else (0, 0)
+
+def registrar_cambio_horario():
+    """Marca una nueva revisión del horario vigente (cambios hechos fuera del motor)."""
+    ultima = Generacion.select(fn.MAX(Generacion.id)).scalar()
+    if ultima:
+        Generacion.update(revision=Generacion.revision + 1).where(Generacion.id == ultima).execute()
+
+def activar_campus(nombre):
+    """
+    Vincula el hilo actual a la base del campus y, la primera vez,
+    crea sus tablas. Devuelve el identificador normalizado.
+    """
+    nombre = activar_db_campus(nombre)
+    if nombre in _campus_preparados:
+        return nombre
+
+    with _lock_preparacion:
+        if nombre not in _campus_preparados:
+            cerrar = db.is_closed()
+            if cerrar:
+                db.connect()
+            try:
+                db.create_tables(MODELOS, safe=True)
+                _migrar_esquema()
+                _migrar_demanda()
+                _crear_generacion_base()
+            finally:
+                if cerrar:
+                    db.close()
+            _campus_preparados.add(nombre)
+    return nombre
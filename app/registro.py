@@ -0,0 +1,158 @@
+import atexit
+import contextvars
+import datetime
+import json
+import logging
+import os
+import queue
+import time
+import uuid
+from contextlib import contextmanager
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+# Logger que recibe el log de búsqueda de CP-SAT (una línea por registro, un archivo por ejecución)
+LOGGER_BUSQUEDA = 'app.engine.cpsat'
+
+# Archivos abiertos a la vez para logs de búsqueda (generaciones simultáneas de distintos campus)
+MAX_ARCHIVOS_BUSQUEDA = 8
+
+ARCHIVO_LOG = 'sistema_horarios.jsonl'
+CARPETA_BUSQUEDA = 'solver'
+
+# Contexto de la ejecución en curso (id y campus), visible para todos los registros del hilo
+_ejecucion = contextvars.ContextVar('ejecucion', default=None)
+
+_listener = None
+
+
+class FiltroContexto(logging.Filter):
+    """Agrega a cada registro el id de ejecución y el campus del contexto actual."""
+
+    def filter(self, record):
+        ejecucion = _ejecucion.get()
+        if ejecucion and not hasattr(record, 'run_id'):
+            record.run_id = ejecucion['run_id']
+            record.campus = ejecucion['campus']
+        return True
+
+
+class ManejadorCola(QueueHandler):
+    """
+    QueueHandler que no formatea en el hilo que registra: solo resuelve el mensaje.
+    La traza de la excepción (exc_info) viaja en el registro y se formatea en el hilo del listener.
+    """
+
+    def prepare(self, record):
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+
+class FormatoJSON(logging.Formatter):
+    """Una línea JSON por registro, con los campos de contexto (run_id, campus, fase, duracion_ms)."""
+
+    CAMPOS_EXTRA = ('run_id', 'campus', 'fase', 'duracion_ms')
+
+    def format(self, record):
+        datos = {
+            'ts': datetime.datetime.fromtimestamp(record.created).isoformat(timespec='milliseconds'),
+            'nivel': record.levelname,
+            'logger': record.name,
+            'mensaje': record.getMessage(),
+            'origen': f"{record.pathname}:{record.lineno}",
+        }
+        for campo in self.CAMPOS_EXTRA:
+            if hasattr(record, campo):
+                datos[campo] = getattr(record, campo)
+        if record.exc_info:
+            datos['traza'] = self.formatException(record.exc_info)
+        return json.dumps(datos, ensure_ascii=False, default=str)
+
+
+class ArchivoBusqueda(logging.Handler):
+    """Escribe el log de búsqueda de CP-SAT en <carpeta>/<run_id>.log (un archivo por ejecución)."""
+
+    def __init__(self, carpeta):
+        super().__init__()
+        self.carpeta = carpeta
+        self.archivos = {}
+        self.addFilter(lambda record: record.name == LOGGER_BUSQUEDA)
+
+    def emit(self, record):
+        run_id = getattr(record, 'run_id', None) or 'sin_id'
+        archivo = self.archivos.get(run_id)
+        if archivo is None:
+            if len(self.archivos) >= MAX_ARCHIVOS_BUSQUEDA:
+                self.archivos.pop(next(iter(self.archivos))).close()
+            os.makedirs(self.carpeta, exist_ok=True)
+            archivo = self.archivos[run_id] = open(os.path.join(self.carpeta, f"{run_id}.log"), 'a', encoding='utf-8')
+        archivo.write(record.getMessage().rstrip('\n') + '\n')
+        if getattr(record, 'fin_busqueda', False):
+            self.archivos.pop(run_id).close()
+
+    def close(self):
+        for archivo in self.archivos.values():
+            archivo.close()
+        self.archivos.clear()
+        super().close()
+
+
+def configurar_registro(logger, carpeta, nivel=logging.INFO):
+    """
+    Envía los registros de 'logger' (y sus hijos, p. ej. app.engine.*) a una cola;
+    un QueueListener en segundo plano los escribe como JSON lines y los logs de búsqueda
+    de CP-SAT en archivos por ejecución. Idempotente por proceso.
+    """
+    global _listener
+    logger.setLevel(nivel)
+    if _listener is not None:
+        return _listener
+
+    principal = RotatingFileHandler(os.path.join(carpeta, ARCHIVO_LOG), maxBytes=5 * 1024 * 1024, backupCount=5, encoding='utf-8')
+    principal.setFormatter(FormatoJSON())
+    principal.setLevel(nivel)
+    principal.addFilter(lambda record: record.name != LOGGER_BUSQUEDA)
+
+    # Consola: solo advertencias y errores, en texto
+    consola = logging.StreamHandler()
+    consola.setFormatter(logging.Formatter('%(asctime)s %(levelname)s %(name)s: %(message)s'))
+    consola.setLevel(logging.WARNING)
+    consola.addFilter(lambda record: record.name != LOGGER_BUSQUEDA)
+
+    cola = queue.SimpleQueue()
+    _listener = QueueListener(cola, principal, consola, ArchivoBusqueda(os.path.join(carpeta, CARPETA_BUSQUEDA)),
+                              respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
+
+    manejador = ManejadorCola(cola)
+    manejador.addFilter(FiltroContexto())
+    logger.addHandler(manejador)
+    return _listener
+
+
+@contextmanager
+def ejecucion(campus=None):
+    """Abre el contexto de una ejecución del motor; todos sus registros llevan el mismo run_id."""
+    run_id = f"{datetime.datetime.now():%Y%m%d-%H%M%S}-{uuid.uuid4().hex[:6]}"
+    token = _ejecucion.set({'run_id': run_id, 'campus': campus})
+    try:
+        yield run_id
+    finally:
+        _ejecucion.reset(token)
+
+
+def run_id_actual():
+    ejecucion_actual = _ejecucion.get()
+    return ejecucion_actual['run_id'] if ejecucion_actual else None
+
+
+@contextmanager
+def fase(logger, nombre):
+    """Mide una fase del motor y la registra con su duración (campos 'fase' y 'duracion_ms')."""
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        duracion = round((time.perf_counter() - inicio) * 1000, 1)
+        logger.info(f"Fase {nombre}: {duracion} ms", extra={'fase': nombre, 'duracion_ms': duracion})
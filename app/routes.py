@@ -1,14 +1,25 @@
-from flask import Blueprint, render_template, request, jsonify, Response, current_app
-from app.models import Profesor, Materia, ProfesorMateria, db, Horario, Curso
-from app.engine.solver import generar_horario_automatico
+from flask import Blueprint, render_template, request, jsonify, Response, current_app, g
+from app.models import Profesor, Materia, ProfesorMateria, DemandaMateria, db, Horario, Curso, Generacion, MODO_BASE
+from app.engine.solver import generar_horario_automatico, MODO_PONDERADO, MODOS_OPTIMIZACION, TIEMPO_LIMITE_SEGUNDOS, NUM_ALTERNATIVAS, FRACCION_ALTERNATIVAS
+from app.engine.control import cancelar_generacion, generacion_en_curso
+from app.engine.grilla import cargar_grilla
+from app.engine.analitica import obtener_analitica
+from app.engine.instancia import leer_datos
+from app.engine.escenarios import evaluar_escenarios
+from app.engine.edicion import mover_curso
+from app.engine.alternativas import listar_alternativas, aplicar_alternativa
+from app.engine.eventos import instantanea, etiqueta_version, publicar_cambios, suscribir, desuscribir, INTERVALO_KEEPALIVE
+from app.database import listar_campus, normalizar_campus, campus_activo
+from app.models import activar_campus, registrar_cambio_horario, version_horario, guardar_demanda, leer_desglose, totales_demanda
 import json
-import traceback
+import queue
 
 bp = Blueprint('main', __name__)
 
 @bp.route('/')
 def index():
-    return render_template('index.html')
+    return render_template('index.html', num_alternativas=NUM_ALTERNATIVAS,
+                           porcentaje_alternativas=round(FRACCION_ALTERNATIVAS * 100))
 
 @bp.route('/calendario')
 def calendario():
@@ -22,6 +33,27 @@ def config():
 def reportes():
     return render_template('reportes.html')
 
+@bp.route('/api/campus', methods=['GET', 'POST'])
+def manage_campus():
+    if request.method == 'POST':
+        data = request.json or {}
+        try:
+            campus = normalizar_campus(data.get('nombre'))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        try:
+            # Crea la base del nuevo campus sin alterar la conexión de esta petición
+            with campus_activo(campus):
+                activar_campus(campus)
+            resp = jsonify({'status': 'ok', 'campus': campus})
+            resp.set_cookie('campus', campus, max_age=60 * 60 * 24 * 365, samesite='Lax')
+            return resp
+        except Exception as e:
+            current_app.logger.error(f"Error activando campus {campus}. Detalle: {str(e)}", exc_info=True)
+            return jsonify({'error': 'No se pudo preparar la base de datos del campus.'}), 500
+
+    return jsonify({'activo': g.campus, 'campus': sorted(set(listar_campus()) | {g.campus})})
+
 @bp.route('/api/materias', methods=['GET', 'POST', 'DELETE'])
 def manage_materias():
     if request.method == 'POST':
@@ -35,41 +67,42 @@ def manage_materias():
                 current_app.logger.warning(f"Intento de duplicado de materia: {nombre_materia} Nivel {nivel_materia}")
                 return jsonify({'error': mensaje_error}), 400
 
-            desglose_str = json.dumps(data['desglose'])
-            Materia.create(
-                nombre=nombre_materia,
-                nivel=nivel_materia,
-                desglose_horarios=desglose_str
-            )
+            with db.atomic():
+                materia = Materia.create(nombre=nombre_materia, nivel=nivel_materia)
+                guardar_demanda(materia.id, data['desglose'])
             return jsonify({'status': 'ok'})
         except Exception as e:
-            current_app.logger.error(f"Error de código/lógica creando materia. Datos: {data}. Detalle: {str(e)}\nTraza:\n{traceback.format_exc()}")
+            current_app.logger.error(f"Error de código/lógica creando materia. Datos: {data}. Detalle: {str(e)}", exc_info=True)
             return jsonify({'error': 'No se pudo registrar la materia. Verifique que los datos sean correctos o que no exista un duplicado exacto.'}), 400
             
     if request.method == 'DELETE':
         materia_id = request.args.get('id')
         try:
-            with db.atomic():
+            with publicar_cambios(), db.atomic():
                 Horario.delete().where(Horario.materia == materia_id).execute()
+                registrar_cambio_horario()
                 ProfesorMateria.delete().where(ProfesorMateria.materia == materia_id).execute()
+                DemandaMateria.delete().where(DemandaMateria.materia == materia_id).execute()
                 Materia.delete().where(Materia.id == materia_id).execute()
             return jsonify({'status': 'ok'})
         except Exception as e:
-            current_app.logger.error(f"Error eliminando materia ID {materia_id}. Detalle: {str(e)}\nTraza:\n{traceback.format_exc()}")
+            current_app.logger.error(f"Error eliminando materia ID {materia_id}. Detalle: {str(e)}", exc_info=True)
             return jsonify({'error': 'Error interno al intentar eliminar la materia. Asegúrese de que no tenga dependencias estrictas.'}), 400
 
     try:
-        materias = Materia.select().order_by(Materia.nombre, Materia.nivel)
+        materias = Materia.select(Materia.id, Materia.nombre, Materia.nivel).order_by(Materia.nombre, Materia.nivel)
+        # Demanda y totales con una consulta cada uno (sin parsear JSON por materia)
+        desgloses = leer_desglose()
+        totales = totales_demanda()
         lista = []
         for m in materias:
-            try:
-                desglose = json.loads(m.desglose_horarios)
-            except:
-                desglose = {"PRESENCIAL":{}, "ONLINE_LJ":{}, "ONLINE_FDS":{}}
+            desglose = {"PRESENCIAL": {}, "ONLINE_LJ": {}, "ONLINE_FDS": {}}
+            desglose.update(desgloses.get(m.id, {}))
+            total = totales.get(m.id, {})
 
-            total_reg = sum(desglose.get('PRESENCIAL', {}).values())
-            total_on_lj = sum(desglose.get('ONLINE_LJ', {}).values())
-            total_on_fds = sum(desglose.get('ONLINE_FDS', {}).values())
+            total_reg = total.get('PRESENCIAL', 0)
+            total_on_lj = total.get('ONLINE_LJ', 0)
+            total_on_fds = total.get('ONLINE_FDS', 0)
 
             lista.append({
                 'id': m.id,
@@ -83,9 +116,24 @@ def manage_materias():
             })
         return jsonify(lista)
     except Exception as e:
-        current_app.logger.error(f"Error cargando lista de materias. Detalle: {str(e)}\nTraza:\n{traceback.format_exc()}")
+        current_app.logger.error(f"Error cargando lista de materias. Detalle: {str(e)}", exc_info=True)
         return jsonify({'error': 'Fallo al intentar leer las materias desde la base de datos.'}), 500
 
+@bp.route('/api/grilla', methods=['GET'])
+def get_grilla():
+    grilla = cargar_grilla()
+    modalidades = {}
+    for modalidad, info in grilla.modalidades.items():
+        patron = grilla.patrones[info['patron']]
+        modalidades[modalidad] = {
+            'patron': info['patron'],
+            'presencial': info['presencial'],
+            'dias': patron['dias'],
+            'bloques': patron['bloques'],
+            'duracion': patron['duracion']
+        }
+    return jsonify({'modalidades': modalidades, 'gap_desplazamiento_horas': grilla.gap})
+
 @bp.route('/api/profesores', methods=['GET'])
 def get_profesores():
     try:
@@ -101,7 +149,7 @@ def get_profesores():
             })
         return jsonify(profes)
     except Exception as e:
-        current_app.logger.error(f"Error al listar profesores. Detalle: {str(e)}\nTraza:\n{traceback.format_exc()}")
+        current_app.logger.error(f"Error al listar profesores. Detalle: {str(e)}", exc_info=True)
         return jsonify({'error': 'No se pudieron cargar los profesores de la base de datos.'}), 500
 
 @bp.route('/api/profesores', methods=['POST'])
@@ -119,32 +167,35 @@ def create_profesor():
             )
             for materia_id in data.get('materias_ids', []):
                 ProfesorMateria.create(profesor=p, materia_id=materia_id)
+            registrar_cambio_horario()
         return jsonify({'status': 'ok'})
     except Exception as e:
-        current_app.logger.error(f"Error creando profesor con datos: {data}. Detalle: {str(e)}\nTraza:\n{traceback.format_exc()}")
+        current_app.logger.error(f"Error creando profesor con datos: {data}. Detalle: {str(e)}", exc_info=True)
         return jsonify({'error': 'Fallo en el sistema al guardar el profesor. Verifique que los campos sean correctos.'}), 400
 
 @bp.route('/api/profesores/<int:id>', methods=['PUT'])
 def update_profesor(id):
     data = request.json
     try:
-        query = Profesor.update(nombre=data['nombre']).where(Profesor.id == id)
-        query.execute()
+        with db.atomic():
+            Profesor.update(nombre=data['nombre']).where(Profesor.id == id).execute()
+            registrar_cambio_horario()
         return jsonify({'status': 'ok'})
     except Exception as e:
-        current_app.logger.error(f"Error actualizando profesor ID {id}. Datos: {data}. Detalle: {str(e)}\nTraza:\n{traceback.format_exc()}")
+        current_app.logger.error(f"Error actualizando profesor ID {id}. Datos: {data}. Detalle: {str(e)}", exc_info=True)
         return jsonify({'error': 'No se logró actualizar el nombre del profesor en la base de datos.'}), 400
 
 @bp.route('/api/profesores/<int:id>', methods=['DELETE'])
 def delete_profesor(id):
     try:
-        with db.atomic():
+        with publicar_cambios(), db.atomic():
             Horario.delete().where(Horario.profesor == id).execute()
+            registrar_cambio_horario()
             ProfesorMateria.delete().where(ProfesorMateria.profesor == id).execute()
             Profesor.delete().where(Profesor.id == id).execute()
         return jsonify({'status': 'ok'})
     except Exception as e:
-        current_app.logger.error(f"Error eliminando profesor ID {id}. Detalle: {str(e)}\nTraza:\n{traceback.format_exc()}")
+        current_app.logger.error(f"Error eliminando profesor ID {id}. Detalle: {str(e)}", exc_info=True)
         return jsonify({'error': 'Ocurrió un problema al eliminar el profesor. Podría estar bloqueado por otras dependencias.'}), 400
 
 @bp.route('/api/cursos', methods=['GET', 'POST', 'DELETE'])
@@ -160,7 +211,7 @@ def manage_cursos():
             )
             return jsonify({'status': 'ok'})
         except Exception as e:
-            current_app.logger.error(f"Error al crear curso. Datos: {data}. Detalle: {str(e)}\nTraza:\n{traceback.format_exc()}")
+            current_app.logger.error(f"Error al crear curso. Datos: {data}. Detalle: {str(e)}", exc_info=True)
             return jsonify({'error': 'El curso ya se encuentra registrado o los datos enviados no son válidos.'}), 400
 
     if request.method == 'DELETE':
@@ -168,99 +219,162 @@ def manage_cursos():
             Curso.delete().where(Curso.id == request.args.get('id')).execute()
             return jsonify({'status': 'ok'})
         except Exception as e:
-            current_app.logger.error(f"Error eliminando curso. Detalle: {str(e)}\nTraza:\n{traceback.format_exc()}")
+            current_app.logger.error(f"Error eliminando curso. Detalle: {str(e)}", exc_info=True)
             return jsonify({'error': 'No es posible eliminar el curso debido a un error interno.'}), 400
 
     try:
         cursos = Curso.select().order_by(Curso.nivel, Curso.nombre)
         return jsonify(list(cursos.dicts()))
     except Exception as e:
-        current_app.logger.error(f"Error cargando los cursos. Detalle: {str(e)}\nTraza:\n{traceback.format_exc()}")
+        current_app.logger.error(f"Error cargando los cursos. Detalle: {str(e)}", exc_info=True)
         return jsonify({'error': 'Error de conexión al obtener los cursos.'}), 500
 
 @bp.route('/api/generar', methods=['POST'])
 def generar():
     current_app.logger.info("Solicitud de generación de horario recibida.")
+    opciones = request.get_json(silent=True) or {}
     try:
-        resultado = generar_horario_automatico()
+        resultado = generar_horario_automatico(
+            modo_optimizacion=opciones.get('modo', MODO_PONDERADO),
+            log_busqueda=bool(opciones.get('log_busqueda')),
+            volcar_modelo=bool(opciones.get('volcar_modelo')),
+            alternativas=int(opciones.get('alternativas', 1))
+        )
         
         if resultado['status'] == 'ok':
             current_app.logger.info("Horario generado exitosamente.")
             return jsonify(resultado)
+        elif resultado.get('ocupado'):
+            current_app.logger.warning(f"Generación rechazada (en curso) para campus {g.campus}.")
+            return jsonify(resultado), 409
         else:
             current_app.logger.warning(f"Fallo en generación: {resultado['message']}")
             return jsonify(resultado), 400
             
     except Exception as e:
         err_msg = f"Error no controlado en motor: {str(e)}"
-        current_app.logger.critical(err_msg + "\n" + traceback.format_exc())
+        current_app.logger.critical(err_msg, exc_info=True)
         return jsonify({"status": "error", "message": "Ocurrió un error crítico durante la generación del algoritmo de horarios."}), 500
 
+@bp.route('/api/generar/cancelar', methods=['POST'])
+def cancelar_generar():
+    if cancelar_generacion(g.campus):
+        return jsonify({'status': 'ok', 'message': 'Cancelación solicitada. El horario vigente se conserva.'})
+    return jsonify({'status': 'error', 'message': 'No hay ninguna generación en curso.'}), 404
+
+@bp.route('/api/generar/estado', methods=['GET'])
+def estado_generar():
+    return jsonify({'en_curso': generacion_en_curso(g.campus)})
+
+@bp.route('/api/escenarios', methods=['POST'])
+def simular_escenarios():
+    # Simulación what-if: no modifica el horario vigente
+    opciones = request.get_json(silent=True) or {}
+    modo = opciones.get('modo', MODO_PONDERADO)
+    if modo not in MODOS_OPTIMIZACION:
+        return jsonify({'status': 'error', 'message': f"Modo de optimización desconocido: {modo}."}), 400
+    try:
+        tiempo_total = min(float(opciones.get('tiempo_limite', 60)), TIEMPO_LIMITE_SEGUNDOS)
+        filas = evaluar_escenarios(leer_datos(), cargar_grilla().config, opciones.get('escenarios', []), modo, tiempo_total)
+        return jsonify({'status': 'ok', 'escenarios': filas})
+    except Exception as e:
+        current_app.logger.warning(f"Fallo en simulación de escenarios: {str(e)}", exc_info=True)
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+
+@bp.route('/api/generacion', methods=['GET'])
+def get_generacion():
+    try:
+        ultima = Generacion.select().order_by(Generacion.id.desc()).first()
+        if not ultima or ultima.modo == MODO_BASE:
+            return jsonify(None)
+        return jsonify({
+            'id': ultima.id,
+            'fecha': ultima.fecha.strftime('%Y-%m-%d %H:%M'),
+            'modo': ultima.modo,
+            'estado': ultima.estado,
+            'cursos_asignados': ultima.cursos_asignados,
+            'cursos_totales': ultima.cursos_totales,
+            'mensaje': ultima.mensaje
+        })
+    except Exception as e:
+        current_app.logger.error(f"Error leyendo la última generación: {str(e)}", exc_info=True)
+        return jsonify({'error': 'No se pudo consultar el estado de la última generación.'}), 500
+
 @bp.route('/api/horario', methods=['GET'])
 def get_horario():
     try:
-        eventos = []
-        horarios = Horario.select().join(Materia).switch(Horario).join(Profesor).switch(Horario).join(Curso)
-        
-        fechas_base = { 
-            0: '2023-11-20', 1: '2023-11-21', 2: '2023-11-22', 
-            3: '2023-11-23', 4: '2023-11-24', 5: '2023-11-25', 
-            6: '2023-11-26'
-        }
+        version = version_horario()
+        respuesta = jsonify(list(instantanea().values()))
+        # Versión de esta lectura: el calendario la usa para encadenar los deltas del flujo de eventos
+        respuesta.headers['X-Version-Horario'] = etiqueta_version(version)
+        return respuesta
+    except Exception as e:
+        current_app.logger.error(f"Error procesando lecturas de horarios: {str(e)}", exc_info=True)
+        return jsonify({'error': 'Incapacidad de leer el horario procesado desde la base de datos.'}), 500
 
-        for h in horarios:
-            if h.dia not in fechas_base: continue
-            
-            start = f"{h.hora_inicio:02d}:00:00"
-            
-            if 'FDS' in h.curso.modalidad and (h.hora_fin - h.hora_inicio) == 8:
-                hora_fin_visual = h.hora_fin + 1
-            else:
-                hora_fin_visual = h.hora_fin
-                
-            end = f"{hora_fin_visual:02d}:00:00"
-            
-            mod_tag = ""
-            color = '#3788d8' 
-
-            if 'ONLINE' in h.curso.modalidad:
-                mod_tag = "[ON]"
-                if 'FDS' in h.curso.modalidad:
-                    color = '#fd7e14' 
-                else:
-                    color = '#6f42c1' 
-            else:
-                if h.curso.turno == 'Vespertino':
-                    color = '#28a745' 
-                else:
-                    color = '#3788d8' 
+@bp.route('/api/horario/mover', methods=['POST'])
+def mover_horario():
+    data = request.get_json(silent=True) or {}
+    try:
+        resultado = mover_curso(
+            int(data['curso_id']),
+            profesor_id=int(data['profesor_id']) if data.get('profesor_id') is not None else None,
+            hora=data.get('hora'),
+            solo_validar=bool(data.get('solo_validar'))
+        )
+        if resultado['status'] == 'ok':
+            return jsonify(resultado)
+        return jsonify(resultado), 409 if resultado.get('violaciones') else 400
+    except Exception as e:
+        current_app.logger.error(f"Error moviendo curso. Datos: {data}. Detalle: {str(e)}", exc_info=True)
+        return jsonify({'status': 'error', 'message': 'No se pudo reasignar el curso. Verifique los datos enviados.'}), 400
 
-            tag_str = f"{mod_tag} " if mod_tag else ""
-            titulo = f"{tag_str}{h.materia.nombre} - {h.materia.nivel} ({h.curso.nombre})\n{h.profesor.nombre}"
-            
-            eventos.append({
-                'title': titulo,
-                'start': f"{fechas_base[h.dia]}T{start}",
-                'end': f"{fechas_base[h.dia]}T{end}",
-                'color': color,
-                'extendedProps': {
-                    'materia_id': h.materia.id,
-                    'profesor_id': h.profesor.id,
-                    'curso_turno': h.curso.turno,
-                    'modalidad': h.curso.modalidad,
-                    'curso_nombre': h.curso.nombre
-                }
-            })
-            
-        return jsonify(eventos)
+@bp.route('/api/alternativas', methods=['GET', 'POST'])
+def alternativas_horario():
+    if request.method == 'POST':
+        data = request.get_json(silent=True) or {}
+        try:
+            resultado = aplicar_alternativa(int(data['numero']))
+            if resultado['status'] == 'ok':
+                return jsonify(resultado)
+            return jsonify(resultado), 409 if resultado.get('violaciones') else 404
+        except Exception as e:
+            current_app.logger.error(f"Error aplicando alternativa. Datos: {data}. Detalle: {str(e)}", exc_info=True)
+            return jsonify({'status': 'error', 'message': 'No se pudo aplicar la alternativa seleccionada.'}), 400
+
+    try:
+        return jsonify(listar_alternativas())
     except Exception as e:
-        current_app.logger.error(f"Error procesando lecturas de horarios: {str(e)}\nTraza:\n{traceback.format_exc()}")
-        return jsonify({'error': 'Incapacidad de leer el horario procesado desde la base de datos.'}), 500
+        current_app.logger.error(f"Error listando alternativas. Detalle: {str(e)}", exc_info=True)
+        return jsonify({'error': 'Error de sistema al obtener los horarios alternativos.'}), 500
+
+@bp.route('/api/horario/eventos', methods=['GET'])
+def stream_horario():
+    # Server-Sent Events: versión actual al conectar y luego deltas/recargas del horario del campus
+    campus = g.campus
+    version = etiqueta_version(version_horario())
+    cola = suscribir(campus)
+
+    def flujo():
+        try:
+            yield f"id: {version}\nevent: version\ndata: {json.dumps({'version': version})}\n\n"
+            while True:
+                try:
+                    evento = cola.get(timeout=INTERVALO_KEEPALIVE)
+                except queue.Empty:
+                    yield ": keepalive\n\n"
+                    continue
+                yield f"id: {evento['version']}\nevent: {evento['tipo']}\ndata: {json.dumps(evento)}\n\n"
+        finally:
+            desuscribir(campus, cola)
+
+    return Response(flujo(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
 
 @bp.route('/api/estadisticas', methods=['GET'])
 def get_estadisticas():
     try:
-        asignaciones = Horario.select()
+        analitica = obtener_analitica()
         profesores = Profesor.select()
         reporte = []
         
@@ -268,11 +382,8 @@ def get_estadisticas():
         total_horas_asignadas = 0
 
         for p in profesores:
-            horas_reales = 0
-            mis_horarios = [x for x in asignaciones if x.profesor.id == p.id]
-            for mh in mis_horarios:
-                duracion = mh.hora_fin - mh.hora_inicio
-                horas_reales += duracion
+            metricas = analitica['profesores'].get(p.id, {})
+            horas_reales = metricas.get('horas', 0)
 
             total_capacidad_horas += p.max_horas_semana
             total_horas_asignadas += horas_reales
@@ -290,7 +401,10 @@ def get_estadisticas():
                 'horas_asignadas': horas_reales, 'horas_maximas': p.max_horas_semana,
                 'estado': estado,
                 'competencias': comp_str,
-                'porcentaje': round((horas_reales / p.max_horas_semana) * 100, 1) if p.max_horas_semana > 0 else 0
+                'porcentaje': round((horas_reales / p.max_horas_semana) * 100, 1) if p.max_horas_semana > 0 else 0,
+                'huecos': metricas.get('huecos', 0),
+                'amplitud_max': metricas.get('amplitud_max', 0),
+                'cambios_modalidad': metricas.get('cambios_modalidad', 0)
             })
 
         cursos_unicos_query = (Horario
@@ -333,17 +447,30 @@ def get_estadisticas():
                 'ocupacion_global_pct': round((total_horas_asignadas / total_capacidad_horas * 100), 1) if total_capacidad_horas > 0 else 0,
                 'distribucion_modalidad': stats_modalidad,
                 'distribucion_turno': stats_turno,
-                'top_materias': top_materias
+                'top_materias': top_materias,
+                'analitica': analitica['resumen'],
+                'version_horario': analitica['version']
             }
         })
     except Exception as e:
-        current_app.logger.error(f"Error procesando las estadísticas globales: {str(e)}\nTraza:\n{traceback.format_exc()}")
+        current_app.logger.error(f"Error procesando las estadísticas globales: {str(e)}", exc_info=True)
         return jsonify({'error': 'Error de sistema calculando las estadísticas en tiempo real.'}), 500
 
+@bp.route('/api/analitica', methods=['GET'])
+def get_analitica():
+    try:
+        return jsonify(obtener_analitica())
+    except Exception as e:
+        current_app.logger.error(f"Error calculando la analítica del horario: {str(e)}", exc_info=True)
+        return jsonify({'error': 'Error de sistema calculando la analítica del horario.'}), 500
+
 @bp.route('/api/backup', methods=['GET'])
 def backup_data():
     try:
-        materias = list(Materia.select().dicts())
+        # Formato V1: la demanda viaja como JSON en 'desglose_horarios'
+        desgloses = leer_desglose()
+        materias = [{'id': m.id, 'nombre': m.nombre, 'nivel': m.nivel, 'desglose_horarios': json.dumps(desgloses.get(m.id, {}))}
+                    for m in Materia.select(Materia.id, Materia.nombre, Materia.nivel)]
         profesores_data = []
         for p in Profesor.select():
             competencias = [f"{pm.materia.nombre}|{pm.materia.nivel}" for pm in p.competencias]
@@ -363,7 +490,7 @@ def backup_data():
         return Response(json.dumps(backup, indent=2), mimetype="application/json",
             headers={"Content-disposition": "attachment; filename=respaldo_configuracion.json"})
     except Exception as e:
-        current_app.logger.error(f"Error generando archivo de respaldo: {str(e)}\nTraza:\n{traceback.format_exc()}")
+        current_app.logger.error(f"Error generando archivo de respaldo: {str(e)}", exc_info=True)
         return jsonify({'error': 'Problema interno al crear el archivo de respaldo JSON.'}), 500
 
 @bp.route('/api/restore', methods=['POST'])
@@ -376,18 +503,18 @@ def restore_data():
         if data.get('system_signature') != 'GENERADOR_HORARIOS_V1':
             return jsonify({'error': 'La firma digital del archivo es inválida o el archivo está corrupto.'}), 400
         
-        with db.atomic():
+        with publicar_cambios(recarga=True), db.atomic():
             Horario.delete().execute()
+            registrar_cambio_horario()
             ProfesorMateria.delete().execute()
             Profesor.delete().execute()
+            DemandaMateria.delete().execute()
             Materia.delete().execute()
             Curso.delete().execute()
 
             for m in data['materias']:
-                Materia.create(
-                    nombre=m['nombre'], nivel=m['nivel'],
-                    desglose_horarios=m.get('desglose_horarios', '{}') 
-                )
+                materia = Materia.create(nombre=m['nombre'], nivel=m['nivel'])
+                guardar_demanda(materia.id, json.loads(m.get('desglose_horarios') or '{}'))
 
             for p in data['profesores']:
                 nuevo_profe = Profesor.create(
@@ -403,5 +530,5 @@ def restore_data():
         
         return jsonify({'status': 'ok', 'message': 'Restauración completada con éxito.'})
     except Exception as e:
-        current_app.logger.error(f"Error durante la lectura/escritura en la restauración de base de datos: {str(e)}\nTraza:\n{traceback.format_exc()}")
+        current_app.logger.error(f"Error durante la lectura/escritura en la restauración de base de datos: {str(e)}", exc_info=True)
         return jsonify({'error': 'Error catastrófico en la restauración. Revise el archivo subido.'}), 500
\ No newline at end of file
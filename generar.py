@@ -0,0 +1,112 @@
+"""
+Generación de horarios por línea de comandos, sin Flask ni la ventana de escritorio
+(p. ej. regeneración nocturna de todos los campus en un servidor).
+
+Uso:
+    python generar.py --campus sede_norte [--campus sede_sur]
+    python generar.py --todos --modo jerarquico --tiempo 300
+    python generar.py --db /ruta/a/horarios.db --json
+
+Código de salida: 0 si todos los horarios se generaron (óptimo o factible), 3 si alguno quedó
+heurístico (best-effort), 1 si alguna generación falló y 2 ante argumentos o bases inválidas.
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+from app.database import SYSTEM_ROOT, db, listar_campus, normalizar_campus, registrar_archivo_campus
+from app.models import Generacion, activar_campus
+from app.registro import configurar_registro
+from app.engine.analitica import obtener_analitica
+from app.engine.solver import generar_horario_automatico, MODO_PONDERADO, MODOS_OPTIMIZACION, TIEMPO_LIMITE_SEGUNDOS, FRACCION_ALTERNATIVAS
+
+SALIDA_OK = 0
+SALIDA_ERROR = 1
+SALIDA_USO = 2
+SALIDA_HEURISTICO = 3
+
+# Gravedad de cada código (el proceso termina con el más grave de todos los campus)
+_GRAVEDAD = [SALIDA_OK, SALIDA_HEURISTICO, SALIDA_ERROR]
+
+
+def generar_campus(campus, modo, tiempo, log_busqueda, volcar_modelo, alternativas):
+    """Genera el horario de un campus y devuelve su fila de resultados (con métricas si se generó)."""
+    activar_campus(campus)
+    db.connect(reuse_if_open=True)
+    try:
+        inicio = time.perf_counter()
+        resultado = generar_horario_automatico(modo, tiempo, log_busqueda=log_busqueda, volcar_modelo=volcar_modelo,
+                                               alternativas=alternativas)
+        fila = {'campus': campus, 'tiempo_s': round(time.perf_counter() - inicio, 2), **resultado}
+        if resultado['status'] != 'ok':
+            fila['salida'] = SALIDA_ERROR
+            return fila
+
+        fila['salida'] = SALIDA_HEURISTICO if resultado.get('heuristico') else SALIDA_OK
+        gen = Generacion.select().order_by(Generacion.id.desc()).first()
+        fila.update(estado=gen.estado, cursos_asignados=gen.cursos_asignados, cursos_totales=gen.cursos_totales,
+                    **obtener_analitica()['resumen'])
+        return fila
+    finally:
+        db.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Genera horarios sin la interfaz web.")
+    destino = parser.add_mutually_exclusive_group(required=True)
+    destino.add_argument('--campus', action='append', help="Campus a generar (repetible).")
+    destino.add_argument('--todos', action='store_true', help="Genera todos los campus existentes.")
+    destino.add_argument('--db', help="Ruta de un archivo de base de datos.")
+    parser.add_argument('--modo', choices=MODOS_OPTIMIZACION, default=MODO_PONDERADO)
+    parser.add_argument('--tiempo', type=float, default=TIEMPO_LIMITE_SEGUNDOS, help="Límite de búsqueda por campus (segundos).")
+    parser.add_argument('--log-busqueda', action='store_true', help="Guarda el log de búsqueda de CP-SAT (logs/solver/<run_id>.log).")
+    parser.add_argument('--volcar-modelo', action='store_true', help="Vuelca modelo e instancia para reproducir.py.")
+    parser.add_argument('--alternativas', type=int, default=1,
+                        help=f"Horarios alternativos a guardar (incluido el publicado); con más de uno, la búsqueda "
+                             f"principal cede el {FRACCION_ALTERNATIVAS * 100:.0f}%% del tiempo límite.")
+    parser.add_argument('--json', action='store_true', help="Imprime los resultados como JSON.")
+    args = parser.parse_args(argv)
+
+    carpeta_logs = os.path.join(SYSTEM_ROOT, 'logs')
+    os.makedirs(carpeta_logs, exist_ok=True)
+    configurar_registro(logging.getLogger('app'), carpeta_logs)
+
+    try:
+        if args.db:
+            if not os.path.isfile(args.db):
+                print(f"No existe la base de datos: {args.db}", file=sys.stderr)
+                return SALIDA_USO
+            campus = [registrar_archivo_campus(args.db)]
+        else:
+            existentes = listar_campus()
+            campus = existentes if args.todos else [normalizar_campus(c) for c in args.campus]
+            faltantes = [c for c in campus if c not in existentes]
+            if faltantes:
+                print(f"Campus inexistentes: {', '.join(faltantes)}", file=sys.stderr)
+                return SALIDA_USO
+    except ValueError as e:
+        print(str(e), file=sys.stderr)
+        return SALIDA_USO
+
+    filas = []
+    for c in campus:
+        fila = generar_campus(c, args.modo, args.tiempo, args.log_busqueda, args.volcar_modelo, args.alternativas)
+        filas.append(fila)
+        if not args.json:
+            print(f"[{c}] {fila['message']} ({fila['tiempo_s']}s, run {fila.get('run_id')})")
+            if fila['salida'] != SALIDA_ERROR:
+                # Las alternativas solo se informan si se pidieron (incluyen el horario publicado)
+                alternativas = f", {fila.get('alternativas', 0)} horarios alternativos" if args.alternativas > 1 else ""
+                print(f"    estado {fila['estado']}: {fila['cursos_asignados']}/{fila['cursos_totales']} cursos, "
+                      f"huecos {fila['huecos_totales']}, cambios de modalidad {fila['cambios_modalidad_totales']}, "
+                      f"gini de carga {fila['gini_carga']}{alternativas}")
+
+    if args.json:
+        print(json.dumps(filas, ensure_ascii=False, indent=2))
+    return max((f['salida'] for f in filas), key=_GRAVEDAD.index, default=SALIDA_OK)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,16 +1,13 @@
 import os
 import sys
 import threading
-import webview
+import multiprocessing
 from time import sleep
 from app import create_app
 
-# Crea la instancia de Flask
-app = create_app()
-
-def run_server():
-    # Ejecuta Flask en un hilo separado
-    app.run(host='127.0.0.1', port=5000, debug=False, use_reloader=False)
+def run_server(app):
+    # Ejecuta Flask en un hilo separado (threaded: cada campus genera en paralelo)
+    app.run(host='127.0.0.1', port=5000, debug=False, use_reloader=False, threaded=True)
 
 def create_desktop_shortcut():
     """
@@ -58,10 +55,20 @@ def create_desktop_shortcut():
         print(f"No se pudo crear el acceso directo: {e}")
 
 if __name__ == '__main__':
+    # Necesario para los procesos de simulación de escenarios en el ejecutable empaquetado
+    multiprocessing.freeze_support()
+
+    # Solo en el proceso principal: los procesos de simulación (spawn) reimportan este módulo
+    # y no deben cargar pywebview, crear la app Flask ni abrir la base de datos.
+    import webview
+
+    # Crea la instancia de Flask
+    app = create_app()
+
     # Crear acceso directo al inicio
     create_desktop_shortcut()
 
-    t = threading.Thread(target=run_server)
+    t = threading.Thread(target=run_server, args=(app,))
     t.daemon = True
     t.start()
 
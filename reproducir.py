@@ -0,0 +1,80 @@
+"""
+Reproduce offline un modelo volcado por una generación (opción volcar_modelo) para medir
+el rendimiento de CP-SAT con distintos parámetros y número de hilos, sin base de datos ni servidor.
+
+Uso:
+    python reproducir.py <carpeta del volcado | run_id> [--workers 1 4 8] [--tiempo 30]
+                         [--param linearization_level=2 --param symmetry_level=0] [--repeticiones 3] [--json]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from ortools.sat.python import cp_model
+from app.engine.volcado import CARPETA_VOLCADOS, cargar_modelo, cargar_volcado
+
+
+def resolver(model, num_workers, tiempo, parametros):
+    solver = cp_model.CpSolver()
+    for parametro in parametros:
+        solver.parameters.merge_text_format(parametro.replace('=', ':', 1))
+    solver.parameters.num_workers = num_workers
+    solver.parameters.max_time_in_seconds = tiempo
+
+    inicio = time.perf_counter()
+    status = solver.Solve(model)
+    con_solucion = status in (cp_model.OPTIMAL, cp_model.FEASIBLE)
+    return {
+        'workers': num_workers,
+        'estado': solver.StatusName(status),
+        'objetivo': solver.ObjectiveValue() if con_solucion else None,
+        'cota': solver.BestObjectiveBound() if con_solucion else None,
+        'tiempo_s': round(time.perf_counter() - inicio, 3),
+        'tiempo_determinista': round(solver.ResponseProto().deterministic_time, 3),
+        'conflictos': solver.NumConflicts(),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Reproduce un modelo CP-SAT volcado y reporta tiempos.")
+    parser.add_argument('volcado', help="Carpeta del volcado o run_id (se busca en la carpeta de volcados).")
+    parser.add_argument('--workers', type=int, nargs='+', default=[8], help="Hilos de búsqueda a probar.")
+    parser.add_argument('--tiempo', type=float, help="Límite de tiempo por ejecución (por defecto, el de la ejecución original).")
+    parser.add_argument('--param', action='append', default=[], help="Parámetro de CP-SAT como clave=valor (repetible).")
+    parser.add_argument('--repeticiones', type=int, default=1)
+    parser.add_argument('--json', action='store_true', help="Imprime los resultados como JSON.")
+    args = parser.parse_args(argv)
+
+    carpeta = args.volcado if os.path.isdir(args.volcado) else os.path.join(CARPETA_VOLCADOS, args.volcado)
+    if not os.path.isdir(carpeta):
+        print(f"No existe el volcado: {args.volcado}", file=sys.stderr)
+        return 2
+
+    inst, grilla, meta = cargar_volcado(carpeta)
+    model = cargar_modelo(carpeta)
+    tiempo = args.tiempo or meta.get('tiempo_limite', 60)
+
+    filas = []
+    for num_workers in args.workers:
+        for _ in range(args.repeticiones):
+            filas.append(resolver(model, num_workers, tiempo, args.param))
+
+    if args.json:
+        print(json.dumps({'volcado': meta, 'parametros': args.param, 'resultados': filas}, ensure_ascii=False, indent=2))
+    else:
+        print(f"Volcado {meta.get('run_id')} ({meta.get('modo')}): {inst.n_cursos} cursos, {inst.n_profesores} profesores, "
+              f"{len(grilla.bloques)} bloques de grilla, límite {tiempo:g}s")
+        if args.param:
+            print(f"Parámetros: {', '.join(args.param)}")
+        print(f"{'workers':>7} {'estado':>10} {'objetivo':>12} {'cota':>12} {'tiempo_s':>9} {'det':>9} {'conflictos':>11}")
+        for f in filas:
+            print(f"{f['workers']:>7} {f['estado']:>10} {f['objetivo'] if f['objetivo'] is not None else '-':>12} "
+                  f"{f['cota'] if f['cota'] is not None else '-':>12} {f['tiempo_s']:>9} {f['tiempo_determinista']:>9} {f['conflictos']:>11}")
+
+    # Código de salida: 0 si todas las ejecuciones encontraron solución
+    return 0 if all(f['objetivo'] is not None for f in filas) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,7 +1,8 @@
 from app import create_app
 
-app = create_app()
-
 if __name__ == '__main__':
+    # Solo en el proceso principal: los procesos de simulación (spawn) reimportan este módulo
+    # y no deben crear la app Flask ni abrir la base de datos.
+    app = create_app()
     # debug=True permite que si cambias código, se recargue solo
-    app.run(debug=True, port=5000)
\ No newline at end of file
+    app.run(debug=True, port=5000)
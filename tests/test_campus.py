@@ -0,0 +1,8 @@
+import os
+from app.database import CAMPUS_DEFECTO, existe_campus, ruta_db_campus
+
+
+def test_campus_inexistente_no_se_crea():
+    assert existe_campus(CAMPUS_DEFECTO)
+    assert not existe_campus('campus-que-no-existe')
+    assert not os.path.exists(ruta_db_campus('campus-que-no-existe'))
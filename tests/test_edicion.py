@@ -0,0 +1,13 @@
+from app.engine.edicion import IndiceOcupacion
+from app.engine.grilla import Grilla, GRILLA_DEFECTO
+
+
+def test_profesor_fuera_del_indice_entra_sin_clases():
+    grilla = Grilla(GRILLA_DEFECTO)
+    indice = IndiceOcupacion(grilla, (1, 0), [10], {1: (10, 0, True, 5)})
+
+    assert indice.violaciones(20, 0, True, (40, 8), True) == []
+    indice.poner(2, 20, 0, True, 5)
+    assert indice.violaciones(20, 0, True, (40, 8), True) == ["El profesor ya tiene otra clase en ese horario."]
+    # El profesor que ya estaba conserva su ocupación
+    assert indice.violaciones(10, 0, True, (40, 8), True) == ["El profesor ya tiene otra clase en ese horario."]
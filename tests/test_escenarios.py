@@ -0,0 +1,21 @@
+from app.engine.escenarios import aplicar_cambios
+
+
+def _datos():
+    materias = [(1, 'FISICA', 1, {'PRESENCIAL': {'9': 3, '11': 1}})]
+    profesores = [(10, 'Ana', 40, 8)]
+    competencias = [(10, 1)]
+    return materias, profesores, competencias
+
+
+def test_cantidad_con_hora_decimal_reemplaza_la_celda():
+    datos = _datos()
+    materias, _, _ = aplicar_cambios(datos, [{'tipo': 'demanda', 'materia_id': 1, 'modalidad': 'PRESENCIAL', 'hora': 9.0, 'cantidad': 0}])
+    assert materias[0][3]['PRESENCIAL'] == {'9': 0, '11': 1}
+    # Los datos originales no se modifican
+    assert datos[0][0][3]['PRESENCIAL']['9'] == 3
+
+
+def test_cantidad_en_hora_nueva():
+    materias, _, _ = aplicar_cambios(_datos(), [{'tipo': 'demanda', 'materia_id': 1, 'modalidad': 'PRESENCIAL', 'hora': '13', 'cantidad': 2}])
+    assert materias[0][3]['PRESENCIAL'] == {'9': 3, '11': 1, '13': 2}
@@ -0,0 +1,40 @@
+import pytest
+from peewee import SqliteDatabase
+from app.database import campus_actual
+from app.models import MODELOS, Curso, Horario, Materia, Profesor, db
+from app.engine.eventos import desuscribir, instantanea, publicar_cambios, suscribir
+
+
+@pytest.fixture
+def horario():
+    anterior = getattr(db._local, 'obj', None)
+    db.initialize(SqliteDatabase(':memory:'))
+    db.create_tables(MODELOS)
+    materia = Materia.create(nombre='FISICA', nivel=1)
+    profesor = Profesor.create(nombre='Ana', max_horas_semana=40, max_horas_dia=8)
+    for c_id in (1, 2):
+        Curso.create(id=c_id, nombre='A', nivel=1, turno='Matutino', modalidad='PRESENCIAL', bloque_horario=7, dias_clase='L-J')
+        for dia in range(4):
+            Horario.create(dia=dia, hora_inicio=7, hora_fin=9, profesor=profesor, materia=materia, curso=c_id)
+    yield
+    db.close()
+    db.initialize(anterior)
+
+
+def test_instantanea_de_cursos(horario):
+    assert len(instantanea()) == 8
+    assert set(instantanea([2])) == {'2-0', '2-1', '2-2', '2-3'}
+
+
+def test_delta_de_un_curso_movido(horario):
+    campus = campus_actual()
+    cola = suscribir(campus)
+    try:
+        with publicar_cambios(cursos=[1]):
+            Horario.update(hora_inicio=9, hora_fin=11).where(Horario.curso == 1).execute()
+        evento = cola.get_nowait()
+    finally:
+        desuscribir(campus, cola)
+    assert evento['tipo'] == 'delta'
+    assert sorted(ev['id'] for ev in evento['modificados']) == ['1-0', '1-1', '1-2', '1-3']
+    assert evento['agregados'] == [] and evento['eliminados'] == []
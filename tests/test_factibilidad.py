@@ -0,0 +1,25 @@
+import pytest
+from app.engine.factibilidad import deficit_slot
+from app.engine.grilla import Grilla, GRILLA_DEFECTO
+from app.engine.instancia import construir_instancia
+from app.engine.solver import validar_recursos
+
+
+def test_slot_sin_profesores_competentes_nombra_la_materia():
+    faltan, materias, profesores = deficit_slot({7: 2}, {7: []})
+    assert faltan == 2
+    assert materias == [7]
+    assert profesores == []
+
+
+def test_validar_recursos_sin_competentes():
+    grilla = Grilla(GRILLA_DEFECTO)
+    materias = [(1, 'FISICA', 1, {'PRESENCIAL': {'9': 2}})]
+    profesores = [(10, 'Ana', 40, 8)]
+    inst = construir_instancia(materias, profesores, [], grilla)
+
+    with pytest.raises(Exception) as error:
+        validar_recursos(inst, grilla)
+    mensaje = str(error.value)
+    assert 'FISICA Nivel 1' in mensaje
+    assert 'Se necesitan 2 cursos' in mensaje
@@ -0,0 +1,31 @@
+import copy
+import pytest
+from app.engine.grilla import Grilla, GRILLA_DEFECTO
+
+
+def test_grilla_defecto():
+    grilla = Grilla(GRILLA_DEFECTO)
+    assert grilla.bloque('L-J', 9) is not None
+
+
+def grilla_media_hora():
+    config = copy.deepcopy(GRILLA_DEFECTO)
+    config['resolucion_minutos'] = 30
+    config['patrones']['L-J'].update(bloques=[7, 8.5, 10], duracion=1.5)
+    return Grilla(config)
+
+
+def test_bloques_de_media_hora():
+    grilla = grilla_media_hora()
+    b7, b85 = grilla.bloque('L-J', 7), grilla.bloque('L-J', 8.5)
+    assert grilla.adyacente[b7, b85]
+    assert not grilla.solapa[b7, b85]
+    assert grilla.carga_de(b7) == (360, 90)
+
+
+@pytest.mark.parametrize('campo, valor', [('bloques', [7, 8.25]), ('duracion', 1.75)])
+def test_rechaza_horas_fuera_de_la_resolucion(campo, valor):
+    config = copy.deepcopy(GRILLA_DEFECTO)
+    config['patrones']['L-J'][campo] = valor
+    with pytest.raises(ValueError):
+        Grilla(config)
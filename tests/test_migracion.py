@@ -0,0 +1,30 @@
+import pytest
+from peewee import SqliteDatabase
+from app.models import MODELOS, Curso, Horario, db, _migrar_esquema, formato_hora
+
+
+@pytest.fixture
+def base_con_horas_enteras():
+    anterior = getattr(db._local, 'obj', None)
+    db.initialize(SqliteDatabase(':memory:'))
+    db.create_tables(MODELOS)
+    # Esquema anterior: horas enteras
+    for tabla, columna in (('curso', 'bloque_horario'), ('horario', 'hora_inicio'), ('horario', 'hora_fin')):
+        sql, = db.execute_sql("SELECT sql FROM sqlite_master WHERE name = ?", (tabla,)).fetchone()
+        db.execute_sql(f'DROP TABLE "{tabla}"')
+        db.execute_sql(sql.replace(f'"{columna}" REAL', f'"{columna}" INTEGER'))
+    yield
+    db.close()
+    db.initialize(anterior)
+
+
+def test_migracion_pasa_las_horas_a_reales(base_con_horas_enteras):
+    _migrar_esquema()
+    tipos = {c.name: c.data_type.upper() for c in db.get_columns('horario')}
+    assert tipos['hora_inicio'] == tipos['hora_fin'] == 'REAL'
+    assert {c.name: c.data_type.upper() for c in db.get_columns('curso')}['bloque_horario'] == 'REAL'
+
+
+@pytest.mark.parametrize('hora, texto', [(7, '07:00'), (8.5, '08:30'), (17.25, '17:15')])
+def test_formato_hora(hora, texto):
+    assert formato_hora(hora) == texto
@@ -0,0 +1,27 @@
+import pytest
+from peewee import SqliteDatabase
+from app.models import MODELOS, Generacion, db, version_horario, registrar_cambio_horario, _crear_generacion_base
+
+
+@pytest.fixture
+def base_vacia():
+    anterior = getattr(db._local, 'obj', None)
+    db.initialize(SqliteDatabase(':memory:'))
+    db.create_tables(MODELOS)
+    yield
+    db.close()
+    db.initialize(anterior)
+
+
+def test_cambios_sin_generaciones_cambian_la_version(base_vacia):
+    _crear_generacion_base()
+    version = version_horario()
+    registrar_cambio_horario()
+    assert version_horario() != version
+    assert version_horario()[0] == version[0]
+
+
+def test_generacion_base_solo_en_bases_vacias(base_vacia):
+    _crear_generacion_base()
+    _crear_generacion_base()
+    assert Generacion.select().count() == 1